@@ -18,6 +18,12 @@ CORS(app, resources={r"/api/*": {"origins": "*"}})
 UPLOAD_FOLDER = 'uploads'
 OUTPUT_FOLDER = 'output_videos'
 ALLOWED_EXTENSIONS = {'mp4', 'avi', 'mov', 'mkv'}
+# Output containers main.py can write, in order of preference, with their mimetypes
+OUTPUT_VIDEO_MIMETYPES = {
+    '.mp4': 'video/mp4',
+    '.webm': 'video/webm',
+    '.avi': 'video/x-msvideo'
+}
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['OUTPUT_FOLDER'] = OUTPUT_FOLDER
@@ -30,11 +36,68 @@ os.makedirs(OUTPUT_FOLDER, exist_ok=True)
 # Store processing status
 processing_status = {}
 
+# Set TENNIS_IN_PROCESS=1 to run analyses inside this process instead of spawning
+# main.py per upload; models then stay loaded between jobs
+IN_PROCESS = os.environ.get('TENNIS_IN_PROCESS', '0') == '1'
+MODEL_MEMORY_MB = int(os.environ.get('TENNIS_MODEL_MEMORY_MB', '0')) or None
+model_registry = None
+# Loaded models and their tracker state are shared, so in-process jobs run one at a time
+analysis_lock = threading.Lock()
+
 warnings.filterwarnings("ignore", message="The parameter 'pretrained' is deprecated")
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def find_output_video(video_id):
+    """Return (path, extension) of the rendered video for video_id, or (None, None)"""
+    for extension in OUTPUT_VIDEO_MIMETYPES:
+        video_path = os.path.join(app.config['OUTPUT_FOLDER'], f'output_{video_id}{extension}')
+        if os.path.exists(video_path):
+            return video_path, extension
+    return None, None
+
+def get_model_registry():
+    global model_registry
+    if model_registry is None:
+        from main import create_model_registry
+        model_registry = create_model_registry(
+            max_memory_bytes=MODEL_MEMORY_MB * 1024 * 1024 if MODEL_MEMORY_MB else None)
+    return model_registry
+
+def preload_models():
+    """Load and warm up every model before the first upload arrives"""
+    with analysis_lock:
+        registry = get_model_registry()
+        for name in ('player', 'ball', 'court'):
+            registry.get(name)
+    print(f"Models loaded: {registry.get_stats()}")
+
+def run_analysis_in_process(video_id, input_path):
+    """Run main.main in this process, reusing the loaded models. Returns an error message or None"""
+    from main import main as run_analysis
+    with analysis_lock:
+        try:
+            run_analysis(input_video_path=input_path, video_id=video_id, model_registry=get_model_registry())
+        except Exception as e:
+            return f'{type(e).__name__}: {e}'
+    return None
+
+def run_analysis_subprocess(video_id, input_path):
+    """Run main.py in a child process. Returns an error message or None"""
+    # Run your main.py script with the uploaded video
+    result = subprocess.run(
+        ['python', 'main.py', '--input', input_path, '--video-id', video_id],
+        capture_output=True,
+        text=True,
+        encoding='utf-8',
+        errors='ignore',
+        timeout=600  # 10 minute timeout
+    )
+    if result.returncode == 0:
+        return None
+    return result.stderr if result.stderr else 'Unknown error'
+
 def process_video_async(video_id, input_path):
     """Process video in background thread"""
     try:
@@ -48,27 +111,22 @@ def process_video_async(video_id, input_path):
         processing_status[video_id]['message'] = 'Running tennis analysis...'
         processing_status[video_id]['progress'] = 20
         
-        # Run your main.py script with the uploaded video
-        result = subprocess.run(
-            ['python', 'main.py', '--input', input_path, '--video-id', video_id],
-            capture_output=True,
-            text=True,
-            encoding='utf-8',
-            errors='ignore',
-            timeout=600  # 10 minute timeout
-        )
+        if IN_PROCESS:
+            error_msg = run_analysis_in_process(video_id, input_path)
+        else:
+            error_msg = run_analysis_subprocess(video_id, input_path)
         
-        if result.returncode == 0:
+        if error_msg is None:
+            video_path, _ = find_output_video(video_id)
             processing_status[video_id] = {
                 'status': 'completed',
                 'progress': 100,
                 'message': 'Analysis complete!',
-                'output_video': f'output_{video_id}.avi',
+                'output_video': os.path.basename(video_path) if video_path else None,
                 'json_file': f'statistics_{video_id}.json',
                 'excel_file': f'statistics_{video_id}.xlsx'
             }
         else:
-            error_msg = result.stderr if result.stderr else 'Unknown error'
             processing_status[video_id] = {
                 'status': 'error',
                 'progress': 0,
@@ -128,23 +186,19 @@ def upload_video():
 def serve_video(video_id):
     """Serve the processed video file"""
     from flask import send_file
-    from pathlib import Path
-    import os
     
     try:
-        OUTPUT_DIR = Path('output_videos')
-        video_filename = f'output_{video_id}.mp4'
-        video_path = OUTPUT_DIR / video_filename
+        video_path, extension = find_output_video(video_id)
         
-        print(f"🎬 Looking for: {video_path}")
-        print(f"   Exists: {video_path.exists()}")
+        print(f"🎬 Looking for: output_{video_id}")
+        print(f"   Found: {video_path}")
         
-        if not video_path.exists():
+        if video_path is None:
             return jsonify({'error': 'Video not found'}), 404
         
         return send_file(
-            str(video_path),
-            mimetype='video/mp4',
+            video_path,
+            mimetype=OUTPUT_VIDEO_MIMETYPES[extension],
             as_attachment=False
         )
     except Exception as e:
@@ -188,11 +242,13 @@ def get_rally_results(video_id):
 @app.route('/api/results/<video_id>/video', methods=['GET'])
 def get_video_results(video_id):
     """Stream video file"""
-    video_path = os.path.join(app.config['OUTPUT_FOLDER'], f'output_{video_id}.avi')
+    video_path, extension = find_output_video(video_id)
     
-    if not os.path.exists(video_path):
+    if video_path is None:
         return jsonify({'error': 'Video not found'}), 404
     
+    mimetype = OUTPUT_VIDEO_MIMETYPES[extension]
+    
     # Get file size
     file_size = os.path.getsize(video_path)
     
@@ -226,32 +282,32 @@ def get_video_results(video_id):
         response = Response(
             generate(),
             206,  # Partial Content
-            mimetype='video/x-msvideo',
+            mimetype=mimetype,
             headers={
                 'Content-Range': f'bytes {byte_start}-{byte_end}/{file_size}',
                 'Accept-Ranges': 'bytes',
                 'Content-Length': str(content_length),
-                'Content-Type': 'video/x-msvideo',
+                'Content-Type': mimetype,
             }
         )
         return response
     else:
         return send_file(
             video_path,
-            mimetype='video/x-msvideo',
+            mimetype=mimetype,
             as_attachment=False,
-            download_name=f'tennis_analysis_{video_id}.avi'
+            download_name=f'tennis_analysis_{video_id}{extension}'
         )
 
 @app.route('/api/results/<video_id>/video/download', methods=['GET'])
 def download_video_results(video_id):
     """Download video file"""
-    video_path = os.path.join(app.config['OUTPUT_FOLDER'], f'output_{video_id}.avi')
+    video_path, extension = find_output_video(video_id)
     
-    if not os.path.exists(video_path):
+    if video_path is None:
         return jsonify({'error': 'Video not found'}), 404
     
-    return send_file(video_path, as_attachment=True, download_name=f'tennis_analysis_{video_id}.avi')
+    return send_file(video_path, as_attachment=True, download_name=f'tennis_analysis_{video_id}{extension}')
 
 @app.route('/api/results/<video_id>/excel', methods=['GET'])
 def get_excel_results(video_id):
@@ -299,4 +355,7 @@ def delete_results(video_id):
 if __name__ == '__main__':
     print("Starting Tennis Analysis API Server...")
     print("Server running at http://localhost:5001")
+    # With debug=True the reloader parent only watches files; load models in the serving child
+    if IN_PROCESS and os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        threading.Thread(target=preload_models, daemon=True).start()
     app.run(debug=True, host='0.0.0.0', port=5001, threaded=True)
@@ -0,0 +1,116 @@
+"""
+Micro-benchmark of BallTracker.get_ball_shot_frames against the original
+per-frame loop, on the tracker stub data and on a long synthetic trajectory.
+The streaming OnlineBallShotDetector is checked and timed on the same data.
+
+    python benchmarks/bench_ball_shot_frames.py --frames 100000
+"""
+import argparse
+import os
+import pickle
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from trackers import BallTracker, OnlineBallShotDetector
+
+def reference_ball_shot_frames(ball_positions):
+    """The original iloc-based detector, kept here as the reference."""
+    ball_positions = [x.get(1,[]) for x in ball_positions]
+    df_ball_positions = pd.DataFrame(ball_positions,columns=['x1','y1','x2','y2'])
+
+    df_ball_positions['mid_y'] = (df_ball_positions['y1'] + df_ball_positions['y2'])/2
+    df_ball_positions['mid_y_rolling_mean'] = df_ball_positions['mid_y'].rolling(window=5, min_periods=1, center=False).mean()
+    df_ball_positions['delta_y'] = df_ball_positions['mid_y_rolling_mean'].diff()
+    minimum_change_frames_for_hit = 25
+    ball_hits = []
+    for i in range(1,len(df_ball_positions)- int(minimum_change_frames_for_hit*1.2) ):
+        negative_position_change = df_ball_positions['delta_y'].iloc[i] >0 and df_ball_positions['delta_y'].iloc[i+1] <0
+        positive_position_change = df_ball_positions['delta_y'].iloc[i] <0 and df_ball_positions['delta_y'].iloc[i+1] >0
+
+        if negative_position_change or positive_position_change:
+            change_count = 0
+            for change_frame in range(i+1, i+int(minimum_change_frames_for_hit*1.2)+1):
+                negative_position_change_following_frame = df_ball_positions['delta_y'].iloc[i] >0 and df_ball_positions['delta_y'].iloc[change_frame] <0
+                positive_position_change_following_frame = df_ball_positions['delta_y'].iloc[i] <0 and df_ball_positions['delta_y'].iloc[change_frame] >0
+
+                if negative_position_change and negative_position_change_following_frame:
+                    change_count+=1
+                elif positive_position_change and positive_position_change_following_frame:
+                    change_count+=1
+
+            if change_count>minimum_change_frames_for_hit-1:
+                ball_hits.append(i)
+
+    return ball_hits
+
+def make_synthetic_trajectory(num_frames, seed=0):
+    """Ball flying back and forth between the baselines with jitter."""
+    rng = np.random.default_rng(seed)
+    ball_positions = []
+    y = 500.0
+    direction = 1
+    frames_left = 0
+    for _ in range(num_frames):
+        if frames_left == 0:
+            direction = -direction
+            frames_left = int(rng.integers(30, 90))
+        frames_left -= 1
+        y += direction * 12 + rng.normal(0, 3)
+        x = 960 + rng.normal(0, 20)
+        ball_positions.append({1: [x - 8, y - 8, x + 8, y + 8]})
+    return ball_positions
+
+def online_ball_shot_frames(ball_positions):
+    shot_detector = OnlineBallShotDetector()
+    hits = []
+    for ball_dict in ball_positions:
+        hit_frame = shot_detector.update(ball_dict.get(1))
+        if hit_frame is not None:
+            hits.append(hit_frame)
+    return hits
+
+def time_call(function, *args, repeat=1):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args)
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark ball hit detection')
+    parser.add_argument('--frames', type=int, default=100000, help='Length of the synthetic trajectory')
+    parser.add_argument('--stub', type=str, default='tracker_stubs/ball_detections.pkl', help='Ball detections stub to check parity on')
+    args = parser.parse_args()
+
+    # No model is needed for trajectory analysis
+    ball_tracker = BallTracker.__new__(BallTracker)
+
+    if os.path.exists(args.stub):
+        with open(args.stub, 'rb') as f:
+            stub_detections = pickle.load(f)
+        stub_positions = ball_tracker.interpolate_ball_positions(stub_detections)
+        expected = reference_ball_shot_frames(stub_positions)
+        actual = ball_tracker.get_ball_shot_frames(stub_positions)
+        print(f"Stub data ({len(stub_positions)} frames): reference {expected}, vectorized {actual}")
+        assert actual == expected, "hit frames differ on stub data"
+        assert online_ball_shot_frames(stub_positions) == expected, "online hit frames differ on stub data"
+
+    ball_positions = make_synthetic_trajectory(args.frames)
+    expected, reference_time = time_call(reference_ball_shot_frames, ball_positions)
+    actual, vectorized_time = time_call(ball_tracker.get_ball_shot_frames, ball_positions, repeat=3)
+    assert actual == expected, "hit frames differ on synthetic data"
+    online, online_time = time_call(online_ball_shot_frames, ball_positions)
+    assert online == expected, "online hit frames differ on synthetic data"
+
+    print(f"Synthetic trajectory: {args.frames} frames, {len(actual)} hits")
+    print(f"  reference loop: {reference_time:.3f}s")
+    print(f"  vectorized:     {vectorized_time:.3f}s")
+    print(f"  speedup:        {reference_time / vectorized_time:.0f}x")
+    print(f"  online:         {online_time:.3f}s ({online_time / args.frames * 1e6:.1f}us per frame)")
+
+if __name__ == '__main__':
+    main()
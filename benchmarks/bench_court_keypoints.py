@@ -0,0 +1,99 @@
+"""
+Parity check and timing of the CourtLineDetector inference paths.
+
+The reference is the FP32 model fed through the torchvision transform
+pipeline (PIL resize) that predict used before preprocess(). Every path,
+including 'none' with its cv2 preprocessing, predicts keypoints on the same
+sampled frames. The script reports the mean and max keypoint error in pixels
+and fails when a path's mean error exceeds --max-mean-error. INT8 is
+calibrated on frames sampled halfway between the compared ones.
+
+For information it also compares the reference with the model in train
+mode (BatchNorm on single-frame batch statistics).
+
+    python benchmarks/bench_court_keypoints.py --frames 64 --every 10
+"""
+import argparse
+import itertools
+import os
+import sys
+import time
+import numpy as np
+import cv2
+import torch
+import torchvision.transforms as transforms
+from copy import deepcopy
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from utils import iter_video_frames
+from court_line_detector import CourtLineDetector
+
+def predict_with_transforms(model, frame):
+    """Keypoints of one frame, preprocessed by the torchvision transform pipeline (PIL resize)."""
+    transform = transforms.Compose([
+        transforms.ToPILImage(),
+        transforms.Resize((224, 224)),
+        transforms.ToTensor(),
+        transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
+    ])
+    image_tensor = transform(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)).unsqueeze(0)
+    with torch.no_grad():
+        keypoints = model(image_tensor).squeeze().cpu().numpy()
+    keypoints[::2] *= frame.shape[1] / 224.0
+    keypoints[1::2] *= frame.shape[0] / 224.0
+    return keypoints
+
+def get_keypoint_errors(keypoints, reference):
+    return np.hypot(keypoints[:, ::2] - reference[:, ::2], keypoints[:, 1::2] - reference[:, 1::2])
+
+def main():
+    parser = argparse.ArgumentParser(description='Court keypoint model parity and speed')
+    parser.add_argument('--video', type=str, default='input_videos/input_video.mp4')
+    parser.add_argument('--model', type=str, default='models/keypoints_model.pth')
+    parser.add_argument('--frames', type=int, default=64, help='Number of frames to compare on')
+    parser.add_argument('--every', type=int, default=10, help='Sample one frame out of this many')
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--max-mean-error', type=float, default=5.0, help='Allowed mean keypoint error in pixels')
+    args = parser.parse_args()
+
+    if args.every < 2:
+        parser.error('--every must be at least 2, INT8 calibration frames are sampled in between')
+    frames = list(itertools.islice(iter_video_frames(args.video), 0, args.frames * args.every, args.every))
+    if not frames:
+        raise ValueError(f"Could not read any frames from {args.video}")
+    # Offset by half a step, so INT8 is never calibrated on a frame it is compared on
+    calibration_frames = list(itertools.islice(iter_video_frames(args.video), args.every // 2,
+                                               args.frames * args.every, args.every))[:args.batch_size]
+
+    reference_model = CourtLineDetector(args.model).model
+    start = time.perf_counter()
+    reference = np.array([predict_with_transforms(reference_model, frame) for frame in frames])
+    reference_time = time.perf_counter() - start
+    print(f"{len(frames)} frames, FP32 transform-pipeline reference: {reference_time / len(frames) * 1000:.1f}ms per frame")
+
+    # Train mode also updates the BatchNorm running statistics, so work on a copy
+    train_mode_model = deepcopy(reference_model).train()
+    train_mode = np.array([predict_with_transforms(train_mode_model, frame) for frame in frames])
+    errors = get_keypoint_errors(train_mode, reference)
+    print(f"  train mode (not gated): keypoint error mean {errors.mean():.2f}px, max {errors.max():.2f}px")
+
+    failures = []
+    for optimization in CourtLineDetector.OPTIMIZATIONS:
+        detector = CourtLineDetector(args.model, optimization=optimization,
+                                     calibration_frames=calibration_frames if optimization == 'int8' else None)
+        detector.predict_many(frames[:1])
+
+        start = time.perf_counter()
+        keypoints = detector.predict_many(frames, batch_size=args.batch_size)
+        elapsed = time.perf_counter() - start
+
+        errors = get_keypoint_errors(keypoints, reference)
+        print(f"  {optimization:12s} predict_many: {elapsed / len(frames) * 1000:.1f}ms per frame "
+              f"({reference_time / elapsed:.1f}x), keypoint error mean {errors.mean():.2f}px, max {errors.max():.2f}px")
+        if errors.mean() > args.max_mean_error:
+            failures.append(optimization)
+
+    assert not failures, f"mean keypoint error above {args.max_mean_error}px for: {', '.join(failures)}"
+
+if __name__ == '__main__':
+    main()
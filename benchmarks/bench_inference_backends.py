@@ -0,0 +1,102 @@
+"""
+Side-by-side benchmark of the ultralytics (PyTorch) and ONNX Runtime backends
+of the YOLO detectors, with a box-level parity check.
+
+Both backends detect on the same frames. Boxes are matched greedily by IoU
+within each class, and the run fails when fewer than --min-match of them
+agree at --match-iou or better.
+
+    python benchmarks/bench_inference_backends.py --weights models/yolo5_last.pt --frames 100
+    python benchmarks/bench_inference_backends.py --weights yolov8x --conf 0.1 --threads 8
+"""
+import argparse
+import itertools
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from utils import iter_video_frames
+from inference_backends import OnnxYoloDetector
+from inference_backends.onnx_yolo import box_iou
+
+def match_boxes(reference, candidate, match_iou):
+    """Greedy IoU matching within each class. Returns (number of matches, IoU of each match)."""
+    matched_ious = []
+    used = np.zeros(len(candidate), dtype=bool)
+    for box, cls in zip(reference.xyxy, reference.cls):
+        available = (~used) & (candidate.cls == cls)
+        if not available.any():
+            continue
+        ious = np.where(available, box_iou(box, candidate.xyxy), 0.0)
+        best = int(ious.argmax())
+        if ious[best] >= match_iou:
+            used[best] = True
+            matched_ious.append(ious[best])
+    return len(matched_ious), matched_ious
+
+def ultralytics_results(results):
+    from inference_backends import DetectionResults
+    boxes = results.boxes
+    return DetectionResults(boxes.xyxy.cpu().numpy(), boxes.conf.cpu().numpy(), boxes.cls.cpu().numpy())
+
+def time_backend(predict, frames, batch_size):
+    detections = []
+    start = time.perf_counter()
+    for i in range(0, len(frames), batch_size):
+        detections.extend(predict(frames[i:i + batch_size]))
+    return detections, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the ultralytics and ONNX Runtime backends')
+    parser.add_argument('--video', type=str, default='input_videos/input_video.mp4')
+    parser.add_argument('--weights', type=str, default='models/yolo5_last.pt')
+    parser.add_argument('--frames', type=int, default=100)
+    parser.add_argument('--conf', type=float, default=0.15)
+    parser.add_argument('--imgsz', type=int, default=640)
+    parser.add_argument('--batch-size', type=int, default=1)
+    parser.add_argument('--threads', type=int, default=None, help='ONNX Runtime intra-op threads')
+    parser.add_argument('--match-iou', type=float, default=0.9)
+    parser.add_argument('--min-match', type=float, default=0.95)
+    args = parser.parse_args()
+
+    from ultralytics import YOLO
+
+    frames = list(itertools.islice(iter_video_frames(args.video), args.frames))
+    if not frames:
+        raise ValueError(f"Could not read any frames from {args.video}")
+
+    torch_model = YOLO(args.weights)
+    onnx_model = OnnxYoloDetector(args.weights, intra_op_threads=args.threads)
+
+    # Warm up both so the timings exclude one-off setup
+    torch_model.predict(frames[0], conf=args.conf, imgsz=args.imgsz, verbose=False)
+    onnx_model.predict(frames[0], conf=args.conf, imgsz=args.imgsz)
+
+    torch_detections, torch_time = time_backend(
+        lambda batch: [ultralytics_results(r) for r in torch_model.predict(batch, conf=args.conf, imgsz=args.imgsz, verbose=False)],
+        frames, args.batch_size)
+    onnx_detections, onnx_time = time_backend(
+        lambda batch: onnx_model.predict(batch, conf=args.conf, imgsz=args.imgsz),
+        frames, args.batch_size)
+
+    reference_boxes = sum(len(d) for d in torch_detections)
+    onnx_boxes = sum(len(d) for d in onnx_detections)
+    matches, matched_ious = 0, []
+    for reference, candidate in zip(torch_detections, onnx_detections):
+        frame_matches, frame_ious = match_boxes(reference, candidate, args.match_iou)
+        matches += frame_matches
+        matched_ious.extend(frame_ious)
+    match_ratio = matches / max(reference_boxes, onnx_boxes, 1)
+
+    print(f"{len(frames)} frames of {args.video}, weights {args.weights}, imgsz {args.imgsz}, batch {args.batch_size}")
+    print(f"  ultralytics: {torch_time:.2f}s ({torch_time / len(frames) * 1000:.1f}ms per frame)")
+    print(f"  onnx:        {onnx_time:.2f}s ({onnx_time / len(frames) * 1000:.1f}ms per frame)")
+    print(f"  speedup:     {torch_time / onnx_time:.2f}x")
+    print(f"  boxes: ultralytics {reference_boxes}, onnx {onnx_boxes}, matched {matches} "
+          f"({match_ratio:.1%}, mean IoU {np.mean(matched_ious) if matched_ious else 0:.3f})")
+    assert match_ratio >= args.min_match, f"only {match_ratio:.1%} of the boxes agree at IoU >= {args.match_iou}"
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Overlay cost of EnhancedTennisStatistics against video length.
+
+Synthetic matches of increasing length are fed through update_frame_stats and
+analyze_shot like main.py does. For each one the script times building the
+per-frame index and drawing both players' overlays on a fixed number of
+sampled frames. With the cumulative index the per-frame overlay time should
+stay flat as the video gets longer; the script fails when the longest video's
+per-frame time exceeds the shortest one's by more than --max-growth. Sampled
+frames are also checked against a full rescan of the shots and positions.
+
+    python benchmarks/bench_stats_overlay.py --lengths 1000 4000 16000
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from enhanced_statistics import EnhancedTennisStatistics
+
+COURT_KEYPOINTS = np.array([574, 307, 1336, 307, 289, 861, 1617, 861, 669, 307, 1242, 307,
+                            463, 861, 1450, 861, 631, 396, 1277, 396, 544, 676, 1366, 676,
+                            955, 396, 955, 676], dtype=np.float32)
+
+def make_statistics(num_frames, shot_every, seed=0):
+    rng = np.random.default_rng(seed)
+    enhanced_stats = EnhancedTennisStatistics(COURT_KEYPOINTS)
+    centers = {1: np.array([950.0, 850.0]), 2: np.array([950.0, 320.0])}
+    for frame_num in range(num_frames):
+        player_boxes, mini_positions = {}, {}
+        for player_id in (1, 2):
+            centers[player_id] += rng.normal(0, 4, 2)
+            x, y = centers[player_id]
+            player_boxes[player_id] = [x - 40, y - 100, x + 40, y + 100]
+            mini_positions[player_id] = (1700 + (x - 300)/10, 100 + (y - 300)/2)
+        enhanced_stats.update_frame_stats(frame_num, player_boxes, {}, mini_positions, None)
+
+        if frame_num % shot_every == 0:
+            player_id = 1 + (frame_num // shot_every) % 2
+            player_position = (float(rng.uniform(0, 400)), float(rng.uniform(0, 400)))
+            ball_position = (player_position[0] + float(rng.uniform(-60, 60)), player_position[1])
+            enhanced_stats.analyze_shot(frame_num, player_id, ball_position, player_position,
+                                        mini_positions[3 - player_id], float(rng.uniform(50, 150)))
+    return enhanced_stats
+
+def scan_stats_up_to_frame(enhanced_stats, player_id, frame_num):
+    """The statistics the overlay shows, recomputed from every shot and position."""
+    stats = enhanced_stats.player_stats[player_id]
+    shots = [shot for shot in stats['shot_locations'] if shot['frame'] <= frame_num]
+    shot_types = [enhanced_stats._estimate_shot_type(shot['player_pos'], shot['ball_pos'], player_id) for shot in shots]
+    positions = [p for p in stats['positions'] if p['frame'] <= frame_num]
+    distance = 0
+    for prev, curr in zip(positions, positions[1:]):
+        distance += np.sqrt((curr['mini_x'] - prev['mini_x'])**2 + (curr['mini_y'] - prev['mini_y'])**2)
+    return {'total_shots': len(shots),
+            'serves': sum(1 for shot in shots if enhanced_stats._is_serve_from_shot(shot)),
+            'forehand': shot_types.count('forehand'),
+            'backhand': shot_types.count('backhand'),
+            'distance': distance * 0.05}
+
+def main():
+    parser = argparse.ArgumentParser(description='Stats overlay time against video length')
+    parser.add_argument('--lengths', type=int, nargs='+', default=[1000, 4000, 16000], help='Video lengths in frames')
+    parser.add_argument('--sample', type=int, default=200, help='Frames drawn per video')
+    parser.add_argument('--shot-every', type=int, default=30, help='Frames between synthetic shots')
+    parser.add_argument('--max-growth', type=float, default=2.0,
+                        help='Allowed ratio of per-frame overlay time between the longest and shortest video')
+    args = parser.parse_args()
+
+    frame = np.zeros((1080, 1920, 3), dtype=np.uint8)
+    per_frame_times = []
+    for num_frames in sorted(args.lengths):
+        enhanced_stats = make_statistics(num_frames, args.shot_every)
+        sample_frames = np.linspace(0, num_frames - 1, args.sample).astype(int)
+
+        start = time.perf_counter()
+        enhanced_stats.build_frame_index()
+        build_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for frame_num in sample_frames:
+            enhanced_stats.draw_enhanced_overlay(frame, player_id=1, frame_num=frame_num)
+            enhanced_stats.draw_enhanced_overlay(frame, player_id=2, frame_num=frame_num)
+        per_frame_time = (time.perf_counter() - start) / len(sample_frames)
+        per_frame_times.append(per_frame_time)
+        print(f"{num_frames:7d} frames: index built in {build_time * 1000:.1f}ms, overlay {per_frame_time * 1000:.2f}ms per frame")
+
+        for frame_num in sample_frames[::10]:
+            for player_id in (1, 2):
+                indexed = enhanced_stats._get_stats_up_to_frame(player_id, frame_num)
+                for name, value in scan_stats_up_to_frame(enhanced_stats, player_id, frame_num).items():
+                    assert np.isclose(indexed[name], value), f"{name} of player {player_id} at frame {frame_num}: {indexed[name]} != {value}"
+
+    growth = per_frame_times[-1] / per_frame_times[0]
+    print(f"Per-frame overlay time grew {growth:.2f}x from {min(args.lengths)} to {max(args.lengths)} frames")
+    assert growth <= args.max_growth, f"overlay time grew {growth:.2f}x, more than {args.max_growth}x"
+
+if __name__ == '__main__':
+    main()
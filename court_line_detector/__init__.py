@@ -1 +1,4 @@
-from .court_line_detector import CourtLineDetector
\ No newline at end of file
+from .court_line_detector import CourtLineDetector
+from .shot_boundary_detector import ShotBoundaryDetector
+from .court_keypoint_timeline_builder import CourtKeypointTimelineBuilder
+from .play_view_classifier import PlayViewClassifier
@@ -0,0 +1,41 @@
+import sys
+import numpy as np
+sys.path.append('../')
+from utils import CourtKeypointTimeline
+from .shot_boundary_detector import ShotBoundaryDetector
+
+class CourtKeypointTimelineBuilder:
+    """
+    Builds a CourtKeypointTimeline while the video streams past: frames go
+    through the shot boundary detector and the keypoint model only runs on the
+    first frame of each shot. With a play_view_classifier, shots that do not
+    show the court are marked as non-play and get no keypoints at all.
+    """
+
+    def __init__(self, court_line_detector, shot_boundary_detector=None, play_view_classifier=None):
+        self.court_line_detector = court_line_detector
+        self.shot_boundary_detector = shot_boundary_detector if shot_boundary_detector is not None else ShotBoundaryDetector()
+        self.play_view_classifier = play_view_classifier
+        self.timeline = CourtKeypointTimeline()
+
+    def get_cache_params(self):
+        shot_boundary_detector = self.shot_boundary_detector
+        params = {'timeline': 'court',
+                  'optimization': self.court_line_detector.optimization,
+                  'cut_threshold': shot_boundary_detector.cut_threshold,
+                  'drift_threshold': shot_boundary_detector.drift_threshold,
+                  'min_shot_length': shot_boundary_detector.min_shot_length,
+                  'width': shot_boundary_detector.width}
+        if self.play_view_classifier is not None:
+            params['play_view_max_distance'] = self.play_view_classifier.max_distance
+        return params
+
+    def update(self, frames, start_frame):
+        """Feed the next consecutive frames, the first of which is frame start_frame."""
+        for i, frame in enumerate(frames):
+            if not self.shot_boundary_detector.update(frame):
+                continue
+            is_play = self.play_view_classifier.is_play_view(frame) if self.play_view_classifier is not None else True
+            keypoints = self.court_line_detector.predict(frame) if is_play else np.full(28, np.nan, dtype=np.float32)
+            self.timeline.add(start_frame + i, keypoints, is_play=is_play)
+        return self.timeline
@@ -1,33 +1,90 @@
 import torch
-import torchvision.transforms as transforms
 import cv2
+from copy import deepcopy
 from torchvision import models
+from torchvision.models import quantization
 import numpy as np
 
 class CourtLineDetector:
-    def __init__(self, model_path):
-        self.model = models.resnet50(weights='IMAGENET1K_V1')
-        self.model.fc = torch.nn.Linear(self.model.fc.in_features, 14*2) 
+    # optimization selects the inference path:
+    # - 'none': the FP32 eager model
+    # - 'torchscript': FP32 model traced and frozen with TorchScript, channels-last
+    # - 'int8': statically quantized (fbgemm) and traced, calibrated on calibration_frames,
+    #   or on the frames of the first predict/predict_many call when none are given
+    # Every path shares preprocess(), so predict() and predict_many() agree on a frame.
+    OPTIMIZATIONS = ['none', 'torchscript', 'int8']
+    INPUT_SIZE = 224
+    MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+    STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+
+    def __init__(self, model_path, optimization='none', calibration_frames=None):
+        if optimization not in self.OPTIMIZATIONS:
+            raise ValueError(f"Unknown optimization '{optimization}'. Available: {', '.join(self.OPTIMIZATIONS)}")
+        self.optimization = optimization
+
+        # The checkpoint holds every weight, so there is no need to download ImageNet ones first.
+        # The quantizable variant has the same parameters plus quant/dequant stubs.
+        if optimization == 'int8':
+            self.model = quantization.resnet50(weights=None, quantize=False)
+        else:
+            self.model = models.resnet50(weights=None)
+        self.model.fc = torch.nn.Linear(self.model.fc.in_features, 14*2)
         self.model.load_state_dict(torch.load(model_path, map_location='cpu'))
-        self.transform = transforms.Compose([
-            transforms.ToPILImage(),
-            transforms.Resize((224, 224)),
-            transforms.ToTensor(),
-            transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
-        ])
+        self.model.eval()
+
+        self.compiled_model = None
+        if optimization == 'torchscript':
+            self.compiled_model = self._trace(self.model.to(memory_format=torch.channels_last))
+        elif optimization == 'int8' and calibration_frames is not None:
+            self.calibrate(calibration_frames)
+
+    def calibrate(self, frames):
+        # Quantize a copy of the FP32 model to INT8, using frames to observe activation ranges
+        model = deepcopy(self.model)
+        model.fuse_model(is_qat=False)
+        model.qconfig = torch.ao.quantization.get_default_qconfig('fbgemm')
+        torch.ao.quantization.prepare(model, inplace=True)
+        with torch.no_grad():
+            model(self.preprocess(frames))
+        torch.ao.quantization.convert(model, inplace=True)
+        self.compiled_model = self._trace(model)
+
+    def _trace(self, model):
+        example = torch.zeros(1, 3, self.INPUT_SIZE, self.INPUT_SIZE).contiguous(memory_format=torch.channels_last)
+        with torch.no_grad():
+            traced_model = torch.jit.trace(model, example)
+        return torch.jit.freeze(traced_model)
+
+    def preprocess(self, frames):
+        # BGR frames -> normalized (N, 3, 224, 224) channels-last tensor, without going through PIL
+        batch = np.empty((len(frames), self.INPUT_SIZE, self.INPUT_SIZE, 3), dtype=np.float32)
+        for i, frame in enumerate(frames):
+            # INTER_AREA averages like PIL's antialiased resize when shrinking
+            resized = cv2.resize(frame, (self.INPUT_SIZE, self.INPUT_SIZE), interpolation=cv2.INTER_AREA)
+            batch[i] = cv2.cvtColor(resized, cv2.COLOR_BGR2RGB)
+        batch = (batch / 255.0 - self.MEAN) / self.STD
+        # NHWC memory viewed as NCHW is exactly the channels-last layout
+        return torch.from_numpy(batch).permute(0, 3, 1, 2)
 
     def predict(self, image):
+        return self.predict_many([image])[0]
 
-    
-        image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        image_tensor = self.transform(image_rgb).unsqueeze(0)
+    def predict_many(self, frames, batch_size=16):
+        # Keypoints of each frame, as an (N, 28) array in the frames' pixel coordinates
+        if self.optimization == 'int8' and self.compiled_model is None:
+            self.calibrate(frames[:batch_size])
+        model = self.compiled_model if self.compiled_model is not None else self.model
+
+        keypoints = []
         with torch.no_grad():
-            outputs = self.model(image_tensor)
-        keypoints = outputs.squeeze().cpu().numpy()
-        original_h, original_w = image.shape[:2]
-        keypoints[::2] *= original_w / 224.0
-        keypoints[1::2] *= original_h / 224.0
+            for start in range(0, len(frames), batch_size):
+                outputs = model(self.preprocess(frames[start:start + batch_size]))
+                keypoints.append(outputs.float().cpu().numpy())
+        keypoints = np.concatenate(keypoints) if keypoints else np.zeros((0, 28), dtype=np.float32)
 
+        frame_sizes = np.array([frame.shape[:2] for frame in frames], dtype=np.float32).reshape(-1, 2)
+        keypoints[:, ::2] *= frame_sizes[:, 1:2] / self.INPUT_SIZE
+        keypoints[:, 1::2] *= frame_sizes[:, 0:1] / self.INPUT_SIZE
         return keypoints
 
     def draw_keypoints(self, image, keypoints):
@@ -38,10 +95,10 @@ class CourtLineDetector:
             cv2.putText(image, str(i//2), (x, y-10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2)
             cv2.circle(image, (x, y), 5, (0, 0, 255), -1)
         return image
-    
+
     def draw_keypoints_on_video(self, video_frames, keypoints):
         output_video_frames = []
         for frame in video_frames:
             frame = self.draw_keypoints(frame, keypoints)
             output_video_frames.append(frame)
-        return output_video_frames
\ No newline at end of file
+        return output_video_frames
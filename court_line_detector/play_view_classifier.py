@@ -0,0 +1,31 @@
+import cv2
+from .shot_boundary_detector import get_frame_histogram
+
+class PlayViewClassifier:
+    """
+    Tells the main court camera apart from replays, close-ups, crowd shots and
+    scoreboards by comparing a frame's colour fingerprint with the court view's.
+
+    The fingerprint is the hue/saturation histogram of the downscaled frame. The
+    reference is set from a frame known to show the court, by default the first
+    frame of the video. A frame is play when its Bhattacharyya distance to the
+    reference is at most max_distance.
+    """
+
+    def __init__(self, max_distance=0.35, width=160):
+        self.max_distance = max_distance
+        self.width = width
+        self.reference_histogram = None
+
+    def set_reference(self, frame):
+        self.reference_histogram = get_frame_histogram(frame, self.width)
+
+    def get_distance(self, frame):
+        histogram = get_frame_histogram(frame, self.width)
+        return cv2.compareHist(self.reference_histogram, histogram, cv2.HISTCMP_BHATTACHARYYA)
+
+    def is_play_view(self, frame):
+        if self.reference_histogram is None:
+            self.set_reference(frame)
+            return True
+        return self.get_distance(frame) <= self.max_distance
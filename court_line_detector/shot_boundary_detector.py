@@ -0,0 +1,56 @@
+import cv2
+import numpy as np
+
+def get_frame_histogram(frame, width=160):
+    """Normalized hue/saturation histogram of the frame downscaled to width pixels."""
+    frame_height, frame_width = frame.shape[:2]
+    height = max(int(frame_height * width / frame_width), 1)
+    small = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+    hsv = cv2.cvtColor(small, cv2.COLOR_BGR2HSV)
+    histogram = cv2.calcHist([hsv], [0, 1], None, [16, 8], [0, 180, 0, 256])
+    return cv2.normalize(histogram, histogram).astype(np.float32)
+
+class ShotBoundaryDetector:
+    """
+    Cheap camera-cut detector working on colour histograms of downscaled frames.
+
+    update() takes the next frame and returns True when it starts a new shot:
+    the first frame, a hard cut (histogram distance to the previous frame above
+    cut_threshold) or a gradual change such as a zoom or a dissolve (distance to
+    the first frame of the current shot above drift_threshold). Shots shorter
+    than min_shot_length frames are not split again, so a dissolve yields one
+    boundary instead of one per frame.
+    """
+
+    def __init__(self, cut_threshold=0.35, drift_threshold=0.5, min_shot_length=12, width=160):
+        self.cut_threshold = cut_threshold
+        self.drift_threshold = drift_threshold
+        self.min_shot_length = min_shot_length
+        self.width = width
+        self.reset()
+
+    def reset(self):
+        self.previous_histogram = None
+        self.shot_histogram = None
+        self.frames_in_shot = 0
+        self.shot_count = 0
+
+    def get_histogram(self, frame):
+        return get_frame_histogram(frame, self.width)
+
+    def update(self, frame):
+        histogram = self.get_histogram(frame)
+
+        is_new_shot = self.previous_histogram is None
+        if not is_new_shot and self.frames_in_shot >= self.min_shot_length:
+            cut_distance = cv2.compareHist(self.previous_histogram, histogram, cv2.HISTCMP_BHATTACHARYYA)
+            drift_distance = cv2.compareHist(self.shot_histogram, histogram, cv2.HISTCMP_BHATTACHARYYA)
+            is_new_shot = cut_distance > self.cut_threshold or drift_distance > self.drift_threshold
+
+        self.previous_histogram = histogram
+        if is_new_shot:
+            self.shot_histogram = histogram
+            self.frames_in_shot = 0
+            self.shot_count += 1
+        self.frames_in_shot += 1
+        return is_new_shot
@@ -0,0 +1,134 @@
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+sys.path.append('../')
+from utils import DetectionTable
+
+def hash_file(file_path, block_size=1024*1024):
+    sha = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+class DetectionCache:
+    """
+    On-disk cache of per-video detections, addressed by content rather than by path.
+
+    An entry's key combines the hash of the video bytes, the hash of the model
+    weights and the inference parameters, so the same upload under a new name
+    hits the cache while different videos or settings never collide. The
+    inference parameters come from the producer's get_cache_params(): everything
+    besides the weights and the video that changes its output.
+    The cache directory is kept under max_size_bytes by evicting the least
+    recently used entries (a hit refreshes the entry's modification time).
+
+    Each entry is a DetectionTable saved as a directory of .npy columns, so a
+    hit memory-maps the arrays instead of unpickling Python objects.
+    """
+
+    def __init__(self, cache_dir='tracker_cache', max_size_bytes=2*1024**3):
+        self.cache_dir = cache_dir
+        self.max_size_bytes = max_size_bytes
+        self._weights_hashes = {}
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def make_key(self, video_hash, model_path, inference_params):
+        payload = json.dumps({
+            'video': video_hash,
+            'weights': self.hash_model_weights(model_path),
+            'params': inference_params
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def hash_model_weights(self, model_path):
+        # Hub model names such as 'yolov8x' resolve to a local .pt file once downloaded
+        weights_path = model_path
+        if not os.path.isfile(weights_path) and os.path.isfile(f"{model_path}.pt"):
+            weights_path = f"{model_path}.pt"
+
+        if not os.path.isfile(weights_path):
+            return f"name:{model_path}"
+
+        stat = os.stat(weights_path)
+        memo_key = (os.path.abspath(weights_path), stat.st_size, stat.st_mtime)
+        if memo_key not in self._weights_hashes:
+            self._weights_hashes[memo_key] = hash_file(weights_path)
+        return self._weights_hashes[memo_key]
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def load(self, key, table_class=DetectionTable):
+        # table_class: any class with save(directory)/load(directory, mmap), e.g. CourtKeypointTimeline
+        entry_path = self._entry_path(key)
+        if not os.path.isdir(entry_path):
+            return None
+
+        try:
+            detections = table_class.load(entry_path, mmap=True)
+            os.utime(entry_path)
+        except FileNotFoundError:
+            # Evicted by another process between the check and the load
+            return None
+        return detections
+
+    def save(self, key, detections):
+        if not hasattr(detections, 'save'):
+            detections = DetectionTable.from_frame_dicts(detections)
+
+        # Several main.py processes may share the cache (one per web upload) and save the
+        # same key at once: each writes its own temporary directory, and the first rename wins
+        entry_path = self._entry_path(key)
+        tmp_path = tempfile.mkdtemp(prefix=f"{key}.", suffix='.tmp', dir=self.cache_dir)
+        try:
+            detections.save(tmp_path)
+            os.replace(tmp_path, entry_path)
+        except OSError:
+            # An entry already in place holds the same detections
+            if not os.path.isdir(entry_path):
+                raise
+        finally:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+        self.evict()
+        return detections
+
+    def get_size_bytes(self):
+        return sum(size for _, _, size in self._list_entries())
+
+    def _list_entries(self):
+        entries = []
+        for entry_name in os.listdir(self.cache_dir):
+            entry_path = os.path.join(self.cache_dir, entry_name)
+            if not os.path.isdir(entry_path) or entry_name.endswith('.tmp'):
+                continue
+            try:
+                size = sum(os.path.getsize(os.path.join(entry_path, file_name)) for file_name in os.listdir(entry_path))
+                entries.append((os.stat(entry_path).st_mtime, entry_name, size))
+            except FileNotFoundError:
+                # Evicted by another process meanwhile
+                continue
+        return entries
+
+    def evict(self, tmp_max_age=24*3600):
+        entries = sorted(self._list_entries())
+        total_size = sum(size for _, _, size in entries)
+        # Oldest first; the most recent entry is always kept
+        for _, entry_name, size in entries[:-1]:
+            if total_size <= self.max_size_bytes:
+                break
+            shutil.rmtree(os.path.join(self.cache_dir, entry_name), ignore_errors=True)
+            total_size -= size
+
+        # Temporary directories left behind by a writer that crashed; live ones are much younger
+        for entry_name in os.listdir(self.cache_dir):
+            entry_path = os.path.join(self.cache_dir, entry_name)
+            try:
+                if entry_name.endswith('.tmp') and time.time() - os.stat(entry_path).st_mtime > tmp_max_age:
+                    shutil.rmtree(entry_path, ignore_errors=True)
+            except FileNotFoundError:
+                continue
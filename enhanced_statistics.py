@@ -3,6 +3,9 @@ import cv2
 import pandas as pd
 from collections import defaultdict
 import json
+import sys
+sys.path.append('../')
+from utils import CourtKeypointTimeline
 
 class EnhancedTennisStatistics:
     """
@@ -15,8 +18,16 @@ class EnhancedTennisStatistics:
         Initialize the statistics tracker.
         
         Args:
-            court_keypoints: Array of 28 values [x1,y1,x2,y2,...] from CourtLineDetector
+            court_keypoints: Array of 28 values [x1,y1,x2,y2,...] from CourtLineDetector,
+                or a CourtKeypointTimeline with the keypoints of each camera shot
         """
+        self.court_keypoint_timeline = court_keypoints if isinstance(court_keypoints, CourtKeypointTimeline) else None
+        self._court_references_by_segment = {}
+        self._court_segment_index = None
+        if self.court_keypoint_timeline is not None:
+            court_keypoints = self.court_keypoint_timeline.get(0)
+            self._court_segment_index = 0
+
         self.court_keypoints = court_keypoints
         self.court_center_x = None
         self.court_top_y = None
@@ -41,6 +52,12 @@ class EnhancedTennisStatistics:
         
         # Frame-by-frame tracking
         self.frame_stats = []
+
+        # Cumulative per-frame counts behind the "up to frame" queries, built on first use
+        self._frame_index = None
+
+        # Rendered statistics panel of each player with the text it shows
+        self._overlay_sprites = {}
         
     def _init_player_stats(self):
         """Initialize comprehensive statistics for a player."""
@@ -96,6 +113,24 @@ class EnhancedTennisStatistics:
             self.baseline_threshold = self.court_bottom_y - (court_height * 0.25)
             self.net_threshold = self.court_top_y + (court_height * 0.25)
     
+    def _use_court_references_for_frame(self, frame_num):
+        """Switch the court references to the camera shot frame_num belongs to."""
+        if self.court_keypoint_timeline is None:
+            return
+        segment_index = self.court_keypoint_timeline.get_segment_index(frame_num)
+        if segment_index == self._court_segment_index:
+            return
+
+        if segment_index not in self._court_references_by_segment:
+            self.court_keypoints = self.court_keypoint_timeline.keypoints[segment_index]
+            self._calculate_court_references()
+            self._court_references_by_segment[segment_index] = (
+                self.court_keypoints, self.court_center_x, self.court_top_y, self.court_bottom_y,
+                self.baseline_threshold, self.net_threshold)
+        (self.court_keypoints, self.court_center_x, self.court_top_y, self.court_bottom_y,
+         self.baseline_threshold, self.net_threshold) = self._court_references_by_segment[segment_index]
+        self._court_segment_index = segment_index
+
     def update_frame_stats(self, frame_num, player_detections, ball_detections, 
                           player_mini_court_positions, ball_mini_court_position):
         """Update statistics for current frame."""
@@ -124,7 +159,9 @@ class EnhancedTennisStatistics:
     def _update_player_position(self, player_id, center_x, center_y, mini_court_pos, frame_num):
         """Update player position and calculate positioning statistics."""
         stats = self.player_stats[player_id]
+        self._frame_index = None
         
+        self._use_court_references_for_frame(frame_num)
         stats['positions'].append({
             'frame': frame_num,
             'x': center_x,
@@ -247,6 +284,7 @@ class EnhancedTennisStatistics:
             return
         
         stats = self.player_stats[player_shot_ball]
+        self._frame_index = None
         stats['total_shots'] += 1
         
         stats['shot_locations'].append({
@@ -498,41 +536,49 @@ class EnhancedTennisStatistics:
             print(f"Error creating Excel file: {e}")
     
     def draw_enhanced_overlay(self, frame, player_id, frame_num):
-        """Draw enhanced statistics overlay on video frame with real-time updates."""
+        """
+        Draw enhanced statistics overlay on video frame with real-time updates.
+
+        The panel is cached as a sprite and a stats line is only re-rendered when
+        its text changes. Each frame dims the panel area and alpha-composites the
+        sprite, touching only the panel region instead of copying the frame.
+        """
         if player_id not in self.player_stats:
             return frame
         
-        current_stats = self._get_stats_up_to_frame(player_id, frame_num)
-        positioning = self._get_positioning_up_to_frame(player_id, frame_num)
-        
+        stats_text = self._get_overlay_text(player_id, frame_num)
+        sprite = self._get_overlay_sprite(player_id, stats_text, frame.shape)
+        if sprite is None:
+            return frame
+
+        # Dim the filled box like blending a black rectangle at 0.7 over the frame
+        box_x1, box_y1, box_x2, box_y2 = self._get_overlay_box(player_id)
+        fill = frame[max(box_y1, 0):box_y2 + 1, max(box_x1, 0):box_x2 + 1]
+        cv2.addWeighted(np.zeros_like(fill), 0.7, fill, 0.3, 0, fill)
+
+        x1, y1, x2, y2 = sprite['region']
+        roi = frame[y1:y2, x1:x2]
+        roi[...] = np.rint(sprite['color'] + roi*sprite['transparency'])
+        return frame
+
+    def _get_overlay_box(self, player_id):
+        """Corners (inclusive) of the filled statistics box of player_id."""
         y_start = 30 if player_id == 1 else 330
         x_start = 20
         box_width = 320
         box_height = 280
-        
-        overlay = frame.copy()
-        cv2.rectangle(overlay, (x_start - 10, y_start - 20), 
-                     (x_start + box_width, y_start + box_height), 
-                     (0, 0, 0), -1)
-        cv2.addWeighted(overlay, 0.7, frame, 0.3, 0, frame)
-        
-        color = (0, 255, 0) if player_id == 1 else (255, 0, 255)
-        cv2.rectangle(frame, (x_start - 10, y_start - 20), 
-                     (x_start + box_width, y_start + box_height), 
-                     color, 3)
-        
-        cv2.putText(frame, f"PLAYER {player_id} STATS", 
-                   (x_start, y_start), 
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
-        
-        y_pos = y_start + 30
-        line_height = 23
+        return x_start - 10, y_start - 20, x_start + box_width, y_start + box_height
+
+    def _get_overlay_text(self, player_id, frame_num):
+        """The lines the overlay shows for player_id at frame_num."""
+        current_stats = self._get_stats_up_to_frame(player_id, frame_num)
+        positioning = self._get_positioning_up_to_frame(player_id, frame_num)
         
         total_shots = current_stats['total_shots']
         fg_pct = (current_stats['forehand'] / total_shots * 100) if total_shots > 0 else 0
         bh_pct = (current_stats['backhand'] / total_shots * 100) if total_shots > 0 else 0
         
-        stats_text = [
+        return (
             f"Total Shots: {current_stats['total_shots']}",
             f"Serves: {current_stats['serves']}",
             f"Forehand: {current_stats['forehand']} ({fg_pct:.1f}%)",
@@ -545,49 +591,160 @@ class EnhancedTennisStatistics:
             f"Distance: {current_stats['distance']:.1f}m",
             f"Rallies: W{current_stats['rallies_won']}/L{current_stats['rallies_lost']}",
             f"Win Rate: {current_stats['win_rate']:.1f}%"
-        ]
+        )
+
+    def _draw_overlay_frame(self, canvas, player_id, origin=(0, 0)):
+        """Border and title of the panel; origin is the frame position of the canvas' top-left pixel."""
+        x1, y1, x2, y2 = self._get_overlay_box(player_id)
+        x_start, y_start = x1 + 10, y1 + 20
+        ox, oy = origin
+        
+        color = (0, 255, 0) if player_id == 1 else (255, 0, 255)
+        cv2.rectangle(canvas, (x1 - ox, y1 - oy), (x2 - ox, y2 - oy), color, 3)
         
-        for i, text in enumerate(stats_text):
+        cv2.putText(canvas, f"PLAYER {player_id} STATS", 
+                   (x_start - ox, y_start - oy), 
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
+        return canvas
+
+    def _get_overlay_line_positions(self, player_id, stats_text):
+        """Frame position of each stats line's text origin, None for the spacer lines."""
+        x1, y1, _, _ = self._get_overlay_box(player_id)
+        x_start, y_start = x1 + 10, y1 + 20
+        
+        y_pos = y_start + 30
+        line_height = 23
+        positions = []
+        for text in stats_text:
             if text == "":
+                positions.append(None)
                 y_pos += line_height // 2
                 continue
-            cv2.putText(frame, text, (x_start, y_pos), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
+            positions.append((x_start, y_pos))
             y_pos += line_height
-        
-        return frame
+        return positions
+
+    def _render_overlay_layer(self, draw, region):
+        """
+        Premultiplied colours and transparency of what draw(canvas, origin) puts
+        in region. Text is antialiased, so both come from drawing on a black and
+        on a white canvas: on black a pixel is coverage*colour, on white the
+        uncovered part lets the 255 through.
+        """
+        x1, y1, x2, y2 = region
+        on_black = draw(np.zeros((y2 - y1, x2 - x1, 3), np.uint8), (x1, y1)).astype(np.float32)
+        on_white = draw(np.full((y2 - y1, x2 - x1, 3), 255, np.uint8), (x1, y1))
+        return on_black, (on_white - on_black) / 255
+
+    def _get_overlay_sprite(self, player_id, stats_text, frame_shape):
+        """
+        The player's rendered panel: premultiplied colours, transparency and the
+        frame region they cover. Border and title are rendered once per frame
+        size; each stats line is re-rendered only when its text changes, into its
+        own strip of the sprite, since most frames change only a line or two.
+        """
+        sprite = self._overlay_sprites.get(player_id)
+        if sprite is None or sprite['frame_shape'] != frame_shape[:2]:
+            # The 3px border reaches a little outside the box outline
+            box_x1, box_y1, box_x2, box_y2 = self._get_overlay_box(player_id)
+            frame_height, frame_width = frame_shape[:2]
+            region = (max(box_x1 - 3, 0), max(box_y1 - 3, 0), min(box_x2 + 4, frame_width), min(box_y2 + 4, frame_height))
+            if region[2] <= region[0] or region[3] <= region[1]:
+                return None
+            color, transparency = self._render_overlay_layer(
+                lambda canvas, origin: self._draw_overlay_frame(canvas, player_id, origin), region)
+            sprite = {'frame_shape': frame_shape[:2], 'region': region, 'color': color, 'transparency': transparency,
+                      'line_positions': self._get_overlay_line_positions(player_id, stats_text),
+                      'lines': [""]*len(stats_text)}
+            self._overlay_sprites[player_id] = sprite
+
+        x1, y1, x2, y2 = sprite['region']
+        _, _, box_x2, _ = self._get_overlay_box(player_id)
+        (_, text_height), baseline = cv2.getTextSize("Ag|%", cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)
+        for slot, (text, position) in enumerate(zip(stats_text, sprite['line_positions'])):
+            if text == sprite['lines'][slot] or position is None:
+                continue
+            # Strip of the line between the border's inner edges, clipped to the sprite
+            x, y = position
+            strip = (max(x - 2, x1), max(y - text_height - 2, y1), min(box_x2 - 2, x2), min(y + baseline + 2, y2))
+            if strip[2] > strip[0] and strip[3] > strip[1]:
+                color, transparency = self._render_overlay_layer(
+                    lambda canvas, origin: cv2.putText(canvas, text, (x - origin[0], y - origin[1]),
+                                                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1), strip)
+                rows, columns = slice(strip[1] - y1, strip[3] - y1), slice(strip[0] - x1, strip[2] - x1)
+                sprite['color'][rows, columns] = color
+                sprite['transparency'][rows, columns] = transparency
+            sprite['lines'][slot] = text
+        return sprite
     
+    def build_frame_index(self):
+        """
+        Build cumulative per-frame arrays of every statistic the overlay shows, so
+        "stats up to frame f" is a lookup at index f instead of a rescan of all
+        shots and positions. Rebuilt automatically after new shots or positions.
+        """
+        num_frames = 1 + max([shot['frame'] for stats in self.player_stats.values() for shot in stats['shot_locations']] +
+                             [position['frame'] for stats in self.player_stats.values() for position in stats['positions']] +
+                             [-1])
+        self._frame_index = {player_id: self._build_player_frame_index(player_id, num_frames)
+                             for player_id in self.player_stats}
+        return self._frame_index
+
+    def _build_player_frame_index(self, player_id, num_frames):
+        stats = self.player_stats[player_id]
+
+        def cumulative(frames, weights=None):
+            return np.cumsum(np.bincount(np.asarray(frames, dtype=np.int64), weights=weights, minlength=num_frames))
+
+        shots = stats['shot_locations']
+        shot_frames = [shot['frame'] for shot in shots]
+        shot_types = [self._estimate_shot_type(shot['player_pos'], shot['ball_pos'], player_id) for shot in shots]
+        index = {
+            'total_shots': cumulative(shot_frames),
+            'serves': cumulative([shot['frame'] for shot in shots if self._is_serve_from_shot(shot)]),
+            'forehand': cumulative([frame for frame, shot_type in zip(shot_frames, shot_types) if shot_type == 'forehand']),
+            'backhand': cumulative([frame for frame, shot_type in zip(shot_frames, shot_types) if shot_type == 'backhand']),
+        }
+
+        # Distance between consecutive positions, counted at the later frame
+        positions = stats['positions']
+        position_frames = np.array([p['frame'] for p in positions], dtype=np.int64)
+        mini_positions = np.array([(p['mini_x'], p['mini_y']) for p in positions], dtype=np.float64).reshape(-1, 2)
+        steps = np.sqrt(((mini_positions[1:] - mini_positions[:-1])**2).sum(axis=1))
+        index['distance'] = cumulative(position_frames[1:], weights=steps)
+
+        # Court zones, using the court references of each position's camera shot
+        zones = {'left': [], 'right': [], 'front': [], 'back': []}
+        for pos in positions:
+            self._use_court_references_for_frame(pos['frame'])
+            if self.court_center_x is not None:
+                zones['left' if pos['x'] < self.court_center_x else 'right'].append(pos['frame'])
+            if self.court_top_y is not None and self.court_bottom_y is not None:
+                if pos['y'] < self.net_threshold:
+                    zones['front'].append(pos['frame'])
+                elif pos['y'] > self.baseline_threshold:
+                    zones['back'].append(pos['frame'])
+        for zone, frames in zones.items():
+            index[zone] = cumulative(frames)
+        return index
+
+    def _get_frame_index_value(self, player_id, name, frame_num):
+        if self._frame_index is None:
+            self.build_frame_index()
+        values = self._frame_index[player_id][name]
+        if frame_num < 0 or len(values) == 0:
+            return values.dtype.type(0)
+        return values[min(frame_num, len(values) - 1)]
+
     def _get_stats_up_to_frame(self, player_id, frame_num):
         """Get statistics calculated only up to the specified frame."""
         stats = self.player_stats[player_id]
         
-        total_shots = sum(1 for shot in stats['shot_locations'] if shot['frame'] <= frame_num)
-        serves = sum(1 for shot in stats['shot_locations'] 
-                    if shot['frame'] <= frame_num and self._is_serve_from_shot(shot))
-        
-        forehand = 0
-        backhand = 0
-        for shot in stats['shot_locations']:
-            if shot['frame'] <= frame_num:
-                shot_type = self._estimate_shot_type(
-                    shot['player_pos'], 
-                    shot['ball_pos'], 
-                    player_id
-                )
-                if shot_type == 'forehand':
-                    forehand += 1
-                elif shot_type == 'backhand':
-                    backhand += 1
-        
-        positions_up_to_frame = [p for p in stats['positions'] if p['frame'] <= frame_num]
-        distance = 0
-        for i in range(1, len(positions_up_to_frame)):
-            prev = positions_up_to_frame[i-1]
-            curr = positions_up_to_frame[i]
-            dist = np.sqrt((curr['mini_x'] - prev['mini_x'])**2 + 
-                         (curr['mini_y'] - prev['mini_y'])**2)
-            distance += dist
-        distance_meters = distance * 0.05
+        total_shots = int(self._get_frame_index_value(player_id, 'total_shots', frame_num))
+        serves = int(self._get_frame_index_value(player_id, 'serves', frame_num))
+        forehand = int(self._get_frame_index_value(player_id, 'forehand', frame_num))
+        backhand = int(self._get_frame_index_value(player_id, 'backhand', frame_num))
+        distance_meters = float(self._get_frame_index_value(player_id, 'distance', frame_num)) * 0.05
         
         rallies_won = stats['rallies_won']
         rallies_lost = stats['rallies_lost']
@@ -606,30 +763,8 @@ class EnhancedTennisStatistics:
     
     def _get_positioning_up_to_frame(self, player_id, frame_num):
         """Get court positioning stats up to the specified frame."""
-        stats = self.player_stats[player_id]
-        
-        positions_up_to_frame = [p for p in stats['positions'] if p['frame'] <= frame_num]
-        
-        if len(positions_up_to_frame) == 0:
-            return {'left': 0, 'right': 0, 'front': 0, 'back': 0}
-        
-        left_count = 0
-        right_count = 0
-        front_count = 0
-        back_count = 0
-        
-        for pos in positions_up_to_frame:
-            if self.court_center_x is not None:
-                if pos['x'] < self.court_center_x:
-                    left_count += 1
-                else:
-                    right_count += 1
-            
-            if self.court_top_y is not None and self.court_bottom_y is not None:
-                if pos['y'] < self.net_threshold:
-                    front_count += 1
-                elif pos['y'] > self.baseline_threshold:
-                    back_count += 1
+        left_count, right_count, front_count, back_count = (
+            int(self._get_frame_index_value(player_id, zone, frame_num)) for zone in ('left', 'right', 'front', 'back'))
         
         total_lr = left_count + right_count
         total_fb = front_count + back_count
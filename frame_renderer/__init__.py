@@ -0,0 +1,9 @@
+from .frame_renderer import FrameRenderer
+from .parallel_render import RenderPool, get_render_workers
+from .layers import (PlayerBoxesLayer,
+                     BallBoxesLayer,
+                     CourtKeypointsLayer,
+                     MiniCourtLayer,
+                     StatsOverlayLayer,
+                     FrameNumberLayer
+                     )
@@ -0,0 +1,78 @@
+import multiprocessing
+import time
+from .parallel_render import RenderPool
+
+class FrameRenderer:
+    """
+    Draws every annotation layer onto one frame at a time.
+
+    A layer is any object with draw(frame, frame_num) that draws in place and
+    returns the frame. render_video pulls frames from an iterable (e.g. a
+    PrefetchVideoReader), runs all layers on each frame and hands it straight
+    to the video writer, so only the frame being drawn is alive instead of a
+    list of frames per drawing pass. Time spent in each layer is accumulated
+    for the run report (summed over workers when rendering in parallel).
+    """
+
+    def __init__(self, layers=None):
+        self.layers = list(layers) if layers is not None else []
+        self.frames_rendered = 0
+        self.workers = 1
+        self.layer_seconds = [0.0]*len(self.layers)
+
+    def add_layer(self, layer):
+        self.layers.append(layer)
+        self.layer_seconds.append(0.0)
+        return self
+
+    def render(self, frame, frame_num):
+        for i, layer in enumerate(self.layers):
+            start = time.perf_counter()
+            frame = layer.draw(frame, frame_num)
+            self.layer_seconds[i] += time.perf_counter() - start
+        self.frames_rendered += 1
+        return frame
+
+    def open_pool(self, frame_shape, workers=1, chunk_size=8):
+        """
+        Start a RenderPool for frames of frame_shape, or return None to render here.
+
+        workers other than 1 (0 or None: one per core) render chunks of chunk_size
+        frames on forked worker processes. Call this before starting the decoder
+        and encoder threads, see RenderPool. Without the fork start method, or
+        when the chunk buffers do not fit in shared memory, frames are rendered
+        sequentially instead.
+        """
+        self.workers = 1
+        if workers == 1 or 'fork' not in multiprocessing.get_all_start_methods():
+            return None
+        try:
+            pool = RenderPool(self, frame_shape, workers=workers, chunk_size=chunk_size)
+        except MemoryError as e:
+            print(f"Rendering sequentially: {e}")
+            return None
+        self.workers = pool.workers
+        return pool
+
+    def render_video(self, frames, video_writer, num_frames=None, pool=None):
+        """
+        Render frames (stopping after num_frames) into video_writer. Returns the number written.
+
+        With a pool from open_pool the frames are rendered on its workers.
+        """
+        if pool is not None:
+            return pool.render_video(frames, video_writer, num_frames=num_frames)
+
+        written = 0
+        for frame_num, frame in enumerate(frames):
+            if num_frames is not None and frame_num >= num_frames:
+                break
+            video_writer.write(self.render(frame, frame_num))
+            written += 1
+        return written
+
+    def get_stats(self):
+        return {'frames_rendered': self.frames_rendered,
+                'workers': self.workers,
+                'layer_seconds': {type(layer).__name__: round(seconds, 3)
+                                  for layer, seconds in zip(self.layers, self.layer_seconds)}}
@@ -0,0 +1,60 @@
+import cv2
+
+class PlayerBoxesLayer:
+    def __init__(self, player_tracker, player_detections):
+        self.player_tracker = player_tracker
+        self.player_detections = player_detections
+
+    def draw(self, frame, frame_num):
+        return self.player_tracker.draw_frame_bboxes(frame, self.player_detections[frame_num])
+
+class BallBoxesLayer:
+    def __init__(self, ball_tracker, ball_detections):
+        self.ball_tracker = ball_tracker
+        self.ball_detections = ball_detections
+
+    def draw(self, frame, frame_num):
+        return self.ball_tracker.draw_frame_bboxes(frame, self.ball_detections[frame_num])
+
+class CourtKeypointsLayer:
+    """Court keypoints of the camera shot each frame belongs to, skipped on non-play frames."""
+
+    def __init__(self, court_line_detector, court_keypoint_timeline, play_mask=None):
+        self.court_line_detector = court_line_detector
+        self.court_keypoint_timeline = court_keypoint_timeline
+        self.play_mask = play_mask
+
+    def draw(self, frame, frame_num):
+        if self.play_mask is not None and not self.play_mask[frame_num]:
+            return frame
+        return self.court_line_detector.draw_keypoints(frame, self.court_keypoint_timeline.get(frame_num))
+
+class MiniCourtLayer:
+    """The mini court with the players and the ball on it."""
+
+    def __init__(self, mini_court, player_positions, ball_positions, player_color=(0,255,0), ball_color=(0,255,255)):
+        self.mini_court = mini_court
+        self.player_positions = player_positions
+        self.ball_positions = ball_positions
+        self.player_color = player_color
+        self.ball_color = ball_color
+
+    def draw(self, frame, frame_num):
+        frame = self.mini_court.draw_mini_court_on_frame(frame)
+        frame = self.mini_court.draw_points_on_frame(frame, self.player_positions[frame_num], color=self.player_color)
+        return self.mini_court.draw_points_on_frame(frame, self.ball_positions[frame_num], color=self.ball_color)
+
+class StatsOverlayLayer:
+    def __init__(self, enhanced_stats, player_ids=(1, 2)):
+        self.enhanced_stats = enhanced_stats
+        self.player_ids = player_ids
+
+    def draw(self, frame, frame_num):
+        for player_id in self.player_ids:
+            frame = self.enhanced_stats.draw_enhanced_overlay(frame, player_id=player_id, frame_num=frame_num)
+        return frame
+
+class FrameNumberLayer:
+    def draw(self, frame, frame_num):
+        cv2.putText(frame, f"Frame: {frame_num}", (10,30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+        return frame
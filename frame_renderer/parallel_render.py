@@ -0,0 +1,147 @@
+import itertools
+import multiprocessing
+import os
+import sys
+from collections import deque
+from multiprocessing.shared_memory import SharedMemory
+import cv2
+import numpy as np
+sys.path.append('../')
+from utils import chunk_frames
+
+# State of a render worker process, set up once by _init_worker
+_worker = {}
+
+def _init_worker(renderer, buffer_names, chunk_shape):
+    # Each worker is one process; OpenCV's own thread pool would only oversubscribe the cores
+    cv2.setNumThreads(1)
+    _worker['renderer'] = renderer
+    _worker['buffers'] = [SharedMemory(name=name) for name in buffer_names]
+    _worker['chunks'] = [np.ndarray(chunk_shape, dtype=np.uint8, buffer=buffer.buf) for buffer in _worker['buffers']]
+
+def _render_chunk(slot, start_frame, count):
+    """Render count frames of shared buffer slot in place. Returns the seconds spent per layer."""
+    renderer = _worker['renderer']
+    renderer.layer_seconds = [0.0]*len(renderer.layers)
+    frames = _worker['chunks'][slot]
+    for i in range(count):
+        frame = frames[i]
+        rendered = renderer.render(frame, start_frame + i)
+        if rendered is not frame:
+            frame[...] = rendered
+    return renderer.layer_seconds
+
+def get_render_workers(workers):
+    """Worker count to use: workers, or every core this process may run on when workers is 0 or None."""
+    if workers:
+        return workers
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return multiprocessing.cpu_count() or 1
+
+def get_shared_memory_free_bytes():
+    """Free bytes of the tmpfs backing SharedMemory, or None where that cannot be checked."""
+    if not os.path.isdir('/dev/shm'):
+        return None
+    stats = os.statvfs('/dev/shm')
+    return stats.f_bavail*stats.f_frsize
+
+class RenderPool:
+    """
+    Worker processes plus the shared-memory buffers they render chunks into.
+
+    There are workers + 2 buffers of chunk_size frames each, so the next chunks
+    are filled while the pool is busy. Workers are forked and inherit the
+    renderer with all its per-frame data, which is why the pool has to be
+    created before any other thread (decoder prefetch, async encoder) is
+    started: fork copies only the calling thread, and a lock held by any other
+    thread stays locked forever in the children.
+
+    Raises MemoryError when the buffers do not fit in the free shared memory.
+    """
+
+    def __init__(self, renderer, frame_shape, workers=None, chunk_size=8):
+        self.renderer = renderer
+        self.workers = get_render_workers(workers)
+        self.chunk_shape = (chunk_size,) + tuple(frame_shape)
+        buffer_size = int(np.prod(self.chunk_shape))
+        num_buffers = self.workers + 2
+        free_bytes = get_shared_memory_free_bytes()
+        if free_bytes is not None and num_buffers*buffer_size > free_bytes:
+            raise MemoryError(f"{num_buffers} render buffers need {num_buffers*buffer_size} bytes of shared memory "
+                              f"but only {free_bytes} are free")
+
+        self.buffers = []
+        self.chunks = []
+        self.pool = None
+        try:
+            for _ in range(num_buffers):
+                self.buffers.append(SharedMemory(create=True, size=buffer_size))
+            self.chunks = [np.ndarray(self.chunk_shape, dtype=np.uint8, buffer=buffer.buf) for buffer in self.buffers]
+            self.pool = multiprocessing.get_context('fork').Pool(
+                self.workers, initializer=_init_worker,
+                initargs=(renderer, [buffer.name for buffer in self.buffers], self.chunk_shape))
+        except BaseException:
+            self.close()
+            raise
+
+    def render_video(self, frames, video_writer, num_frames=None):
+        """
+        Render frames on the pool and write them to video_writer in order.
+
+        Decoded frames are copied into the shared buffers chunk by chunk. Each
+        buffer goes to a worker as one contiguous chunk and is drawn in place,
+        so frames are never pickled. Chunks are written back in submission
+        order. Returns the number of frames written.
+        """
+        frames = iter(frames)
+        if num_frames is not None:
+            frames = itertools.islice(frames, num_frames)
+
+        free_slots = deque(range(len(self.buffers)))
+        pending = deque()
+        start_frame = 0
+        written = 0
+        for chunk in chunk_frames(frames, self.chunk_shape[0]):
+            if chunk[0].shape != self.chunk_shape[1:]:
+                raise ValueError(f"Frame shape {chunk[0].shape} does not match the render pool's {self.chunk_shape[1:]}")
+            if not free_slots:
+                written += self._write_oldest_chunk(video_writer, pending, free_slots)
+            slot = free_slots.popleft()
+            for i, frame in enumerate(chunk):
+                self.chunks[slot][i] = frame
+            pending.append((slot, len(chunk), self.pool.apply_async(_render_chunk, (slot, start_frame, len(chunk)))))
+            start_frame += len(chunk)
+        while pending:
+            written += self._write_oldest_chunk(video_writer, pending, free_slots)
+        return written
+
+    def _write_oldest_chunk(self, video_writer, pending, free_slots):
+        """Wait for the oldest submitted chunk, write its frames and free its buffer. Returns the frame count."""
+        slot, count, result = pending.popleft()
+        for i, seconds in enumerate(result.get()):
+            self.renderer.layer_seconds[i] += seconds
+        for i in range(count):
+            # The writer encodes on its own thread, so it gets a copy before the buffer is reused
+            video_writer.write(self.chunks[slot][i].copy())
+        self.renderer.frames_rendered += count
+        free_slots.append(slot)
+        return count
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+        # The buffers can only be closed once no array views them
+        self.chunks = []
+        for buffer in self.buffers:
+            buffer.close()
+            buffer.unlink()
+        self.buffers = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1 @@
+from .onnx_yolo import OnnxYoloDetector, DetectionResults, export_onnx, letterbox, non_max_suppression
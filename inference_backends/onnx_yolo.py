@@ -0,0 +1,181 @@
+import ast
+import os
+import cv2
+import numpy as np
+
+try:
+    import onnxruntime
+except ImportError:
+    onnxruntime = None
+
+def export_onnx(model_path):
+    """
+    Export YOLO weights to ONNX once and return the path of the graph.
+    The graph is written next to the weights (yolov8x.pt -> yolov8x.onnx) and
+    exported again only when the weights are newer than it.
+    """
+    from ultralytics import YOLO
+
+    weights_path = model_path if model_path.endswith('.pt') else f"{model_path}.pt"
+    onnx_path = os.path.splitext(weights_path)[0] + '.onnx'
+    if os.path.isfile(onnx_path) and (not os.path.isfile(weights_path) or
+                                      os.path.getmtime(onnx_path) >= os.path.getmtime(weights_path)):
+        return onnx_path
+
+    # Dynamic axes let the same graph serve any batch size and input size
+    exported_path = YOLO(weights_path).export(format='onnx', dynamic=True)
+    if os.path.abspath(exported_path) != os.path.abspath(onnx_path):
+        os.replace(exported_path, onnx_path)
+    return onnx_path
+
+def letterbox(image, imgsz, color=(114, 114, 114)):
+    """Resize keeping the aspect ratio and pad to imgsz x imgsz. Returns (image, gain, (pad_x, pad_y))."""
+    height, width = image.shape[:2]
+    gain = min(imgsz / height, imgsz / width)
+    new_width, new_height = int(round(width * gain)), int(round(height * gain))
+    pad_x, pad_y = (imgsz - new_width) / 2, (imgsz - new_height) / 2
+
+    if (new_width, new_height) != (width, height):
+        image = cv2.resize(image, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+    top, bottom = int(round(pad_y - 0.1)), int(round(pad_y + 0.1))
+    left, right = int(round(pad_x - 0.1)), int(round(pad_x + 0.1))
+    image = cv2.copyMakeBorder(image, top, bottom, left, right, cv2.BORDER_CONSTANT, value=color)
+    return image, gain, (left, top)
+
+def box_iou(box, boxes):
+    """IoU of one xyxy box against an (N, 4) array of boxes."""
+    x1 = np.maximum(box[0], boxes[:, 0])
+    y1 = np.maximum(box[1], boxes[:, 1])
+    x2 = np.minimum(box[2], boxes[:, 2])
+    y2 = np.minimum(box[3], boxes[:, 3])
+    intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    return intersection / np.maximum(area + areas - intersection, 1e-9)
+
+def non_max_suppression(boxes, scores, classes, iou_threshold=0.7, max_det=300):
+    """
+    Greedy per-class NMS. Boxes of different classes are shifted apart so they
+    never suppress each other. Returns kept indices sorted by score.
+    """
+    if len(boxes) == 0:
+        return np.zeros(0, dtype=int)
+    offset_boxes = boxes + classes[:, None] * 7680.0
+    order = np.argsort(-scores, kind='stable')
+    keep = []
+    while len(order) > 0 and len(keep) < max_det:
+        best = order[0]
+        keep.append(best)
+        if len(order) == 1:
+            break
+        ious = box_iou(offset_boxes[best], offset_boxes[order[1:]])
+        order = order[1:][ious <= iou_threshold]
+    return np.array(keep, dtype=int)
+
+class DetectionResults:
+    """
+    Detections of one image as NumPy arrays: xyxy (N, 4) in pixels, conf (N,)
+    and cls (N,), sorted by confidence. It exposes the attributes the
+    ultralytics BYTETracker reads, so it can be fed to the tracker directly.
+    """
+
+    def __init__(self, xyxy, conf, cls):
+        self.xyxy = xyxy
+        self.conf = conf
+        self.cls = cls
+
+    @property
+    def xywh(self):
+        xywh = self.xyxy.copy()
+        xywh[:, 2:] = self.xyxy[:, 2:] - self.xyxy[:, :2]
+        xywh[:, :2] = self.xyxy[:, :2] + xywh[:, 2:]/2
+        return xywh
+
+    def __len__(self):
+        return len(self.xyxy)
+
+    def __getitem__(self, index):
+        return DetectionResults(self.xyxy[index], self.conf[index], self.cls[index])
+
+class OnnxYoloDetector:
+    """
+    YOLO inference through ONNX Runtime on CPU.
+
+    The graph comes from export_onnx (exported once and cached next to the
+    weights). Letterboxing, box decoding and NMS are NumPy, and predict()
+    takes one frame or a list of frames and returns a DetectionResults per frame.
+    Both output layouts are handled: YOLOv8-style heads, (batch, 4 + classes,
+    anchors), and YOLOv5-style heads with objectness, (batch, anchors, 5 + classes).
+    """
+
+    def __init__(self, model_path, intra_op_threads=None, iou=0.7, max_det=300):
+        if onnxruntime is None:
+            raise ImportError("The ONNX backend needs onnxruntime: pip install onnxruntime")
+
+        self.model_path = model_path
+        self.onnx_path = model_path if model_path.endswith('.onnx') else export_onnx(model_path)
+        self.iou = iou
+        self.max_det = max_det
+
+        session_options = onnxruntime.SessionOptions()
+        session_options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            session_options.intra_op_num_threads = intra_op_threads
+        self.session = onnxruntime.InferenceSession(self.onnx_path, sess_options=session_options,
+                                                    providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        self.names = ast.literal_eval(metadata['names']) if 'names' in metadata else {}
+        self.stride = int(metadata.get('stride', 32))
+
+    def get_nbytes(self):
+        # The initializers dominate the session's memory and match the graph size on disk
+        return os.path.getsize(self.onnx_path)
+
+    def predict(self, frames, conf=0.25, imgsz=640):
+        if isinstance(frames, np.ndarray) and frames.ndim == 3:
+            frames = [frames]
+        # The input side must be a multiple of the stride
+        imgsz = int(np.ceil(imgsz / self.stride) * self.stride)
+
+        batch = np.empty((len(frames), 3, imgsz, imgsz), dtype=np.float32)
+        transforms = []
+        for i, frame in enumerate(frames):
+            image, gain, pad = letterbox(frame, imgsz)
+            batch[i] = image[:, :, ::-1].transpose(2, 0, 1)
+            transforms.append((gain, pad, frame.shape[:2]))
+        batch /= 255.0
+
+        outputs = self.session.run(None, {self.input_name: batch})[0]
+        return [self._postprocess(output, conf, *transform) for output, transform in zip(outputs, transforms)]
+
+    def _postprocess(self, output, conf, gain, pad, frame_shape):
+        if output.shape[0] < output.shape[1]:
+            # YOLOv8 head: (4 + classes, anchors), class scores only
+            output = output.T
+            class_scores = output[:, 4:]
+        else:
+            # YOLOv5 head: (anchors, 5 + classes), objectness times class scores
+            class_scores = output[:, 5:] * output[:, 4:5]
+
+        classes = class_scores.argmax(axis=1)
+        scores = class_scores[np.arange(len(classes)), classes]
+        candidates = scores > conf
+        boxes_xywh, scores, classes = output[candidates, :4], scores[candidates], classes[candidates]
+
+        boxes = np.empty_like(boxes_xywh)
+        boxes[:, :2] = boxes_xywh[:, :2] - boxes_xywh[:, 2:]/2
+        boxes[:, 2:] = boxes_xywh[:, :2] + boxes_xywh[:, 2:]/2
+
+        keep = non_max_suppression(boxes, scores, classes, iou_threshold=self.iou, max_det=self.max_det)
+        boxes, scores, classes = boxes[keep], scores[keep], classes[keep]
+
+        # Undo the letterbox and clip to the frame
+        boxes[:, [0, 2]] = (boxes[:, [0, 2]] - pad[0]) / gain
+        boxes[:, [1, 3]] = (boxes[:, [1, 3]] - pad[1]) / gain
+        frame_height, frame_width = frame_shape
+        boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, frame_width)
+        boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, frame_height)
+
+        return DetectionResults(boxes.astype(np.float32), scores.astype(np.float32), classes.astype(np.float32))
@@ -1,15 +1,35 @@
-from utils import (read_video, 
-                   save_video,
+from utils import (PrefetchVideoReader,
+                   chunk_frames,
+                   read_first_frame,
+                   read_sampled_frames,
+                   get_video_fps,
+                   get_video_extension,
+                   AsyncVideoWriter,
+                   VIDEO_CODECS,
+                   DetectionTable,
+                   CourtKeypointTimeline,
                    measure_distance,
                    draw_player_stats,
                    convert_pixel_distance_to_meters
                    )
 import constants
 from trackers import PlayerTracker, BallTracker
-from court_line_detector import CourtLineDetector
+from court_line_detector import CourtLineDetector, CourtKeypointTimelineBuilder, PlayViewClassifier
 from mini_court import MiniCourt
+from frame_renderer import (FrameRenderer,
+                            PlayerBoxesLayer,
+                            BallBoxesLayer,
+                            CourtKeypointsLayer,
+                            MiniCourtLayer,
+                            StatsOverlayLayer,
+                            FrameNumberLayer
+                            )
 from enhanced_statistics import EnhancedTennisStatistics
-import cv2
+from detection_cache import DetectionCache, hash_file
+from model_registry import ModelRegistry
+from inference_backends import OnnxYoloDetector
+from ultralytics import YOLO
+import numpy as np
 import pandas as pd
 from copy import deepcopy
 import argparse
@@ -28,7 +48,86 @@ def serve_output_file(filename):
 
 warnings.filterwarnings('ignore')
 
-def main(input_video_path=None, video_id=None):
+PLAYER_MODEL_PATH = 'yolov8x'
+BALL_MODEL_PATH = 'models/yolo5_last.pt'
+COURT_MODEL_PATH = 'models/keypoints_model.pth'
+
+def warm_up_yolo(model, imgsz=640):
+    # The first predict call fuses layers and builds the predictor
+    model.predict(np.zeros((imgsz, imgsz, 3), dtype=np.uint8), imgsz=imgsz)
+
+def warm_up_court_line_detector(detector):
+    # INT8 calibrates on the first real frames it sees, so it must not see a blank one
+    if detector.optimization != 'int8':
+        detector.predict(np.zeros((224, 224, 3), dtype=np.uint8))
+
+def create_model_registry(max_memory_bytes=None, min_available_bytes=None, warmup=True, onnx_threads=None,
+                          court_optimization='none'):
+    """Registry of the models main() needs, for workers that process many videos."""
+    model_registry = ModelRegistry(max_memory_bytes=max_memory_bytes,
+                                   min_available_bytes=min_available_bytes,
+                                   warmup=warmup)
+    model_registry.register('player', lambda: YOLO(PLAYER_MODEL_PATH), warmup=warm_up_yolo)
+    model_registry.register('ball', lambda: YOLO(BALL_MODEL_PATH), warmup=warm_up_yolo)
+    model_registry.register('player_onnx', lambda: OnnxYoloDetector(PLAYER_MODEL_PATH, intra_op_threads=onnx_threads),
+                            warmup=warm_up_yolo)
+    model_registry.register('ball_onnx', lambda: OnnxYoloDetector(BALL_MODEL_PATH, intra_op_threads=onnx_threads),
+                            warmup=warm_up_yolo)
+    model_registry.register('court', lambda: CourtLineDetector(COURT_MODEL_PATH, optimization=court_optimization),
+                            warmup=warm_up_court_line_detector)
+    return model_registry
+
+def detect_players_and_ball(video_reader, player_tracker, ball_tracker, chunk_size,
+                            ball_batch_size=1, timeline_builder=None, court_keypoint_timeline=None):
+    """
+    Run both detectors over the video one chunk of frames at a time.
+    A tracker passed as None is skipped and None is returned in its place.
+    A timeline_builder builds the court keypoint timeline in the same pass. Frames
+    of non-play shots in the timeline skip detection and get empty dicts. When the
+    player tracker has a court_margin, its court region follows the keypoints of each camera shot.
+    """
+    if timeline_builder is not None:
+        court_keypoint_timeline = timeline_builder.timeline
+    player_detections = [] if player_tracker is not None else None
+    ball_detections = [] if ball_tracker is not None else None
+    num_frames = 0
+    for chunk in chunk_frames(video_reader, chunk_size):
+        if timeline_builder is not None:
+            timeline_builder.update(chunk, num_frames)
+
+        # Split the chunk where a new camera shot starts so each part uses its own court region
+        segment_bounds = [0, len(chunk)]
+        if court_keypoint_timeline is not None:
+            shot_starts = court_keypoint_timeline.get_segment_starts_in(num_frames + 1, num_frames + len(chunk))
+            segment_bounds = [0] + [start - num_frames for start in shot_starts] + [len(chunk)]
+
+        for start, end in zip(segment_bounds[:-1], segment_bounds[1:]):
+            if court_keypoint_timeline is not None and not court_keypoint_timeline.is_play_frame(num_frames + start):
+                # Replay, crowd shot or scoreboard: nothing to detect
+                if player_tracker is not None:
+                    player_detections.extend({} for _ in range(end - start))
+                if ball_tracker is not None:
+                    ball_detections.extend({} for _ in range(end - start))
+                continue
+
+            if player_tracker is not None:
+                if player_tracker.court_margin is not None and court_keypoint_timeline is not None:
+                    player_tracker.set_court_region(court_keypoint_timeline.get(num_frames + start), chunk[start].shape)
+                player_detections.extend(player_tracker.detect_frames(chunk[start:end]))
+            if ball_tracker is not None:
+                ball_detections.extend(ball_tracker.detect_frames(chunk[start:end], batch_size=ball_batch_size))
+        num_frames += len(chunk)
+        print(f"  Detected {num_frames} frames")
+
+    return player_detections, ball_detections
+
+def main(input_video_path=None, video_id=None, chunk_size=64, prefetch_depth=32, codec='h264',
+         ball_batch_size=8, cache_dir='tracker_cache', cache_size_mb=2048, use_cache=True,
+         ball_smoothing='interpolate', ball_max_gap=15, ball_roi_size=None, ball_roi_lost_frames=5,
+         player_keyframe_interval=None, player_court_margin=None, model_registry=None,
+         inference_backend='ultralytics', onnx_threads=None, court_optimization='none',
+         play_view_max_distance=0.35, static_frame_threshold=None, mini_court_projection='keypoint',
+         render_workers=1, render_chunk_size=8):
     try:
         # Default paths or use command line arguments
         if input_video_path is None:
@@ -37,67 +136,178 @@ def main(input_video_path=None, video_id=None):
         if video_id is None:
             video_id = "default"
         
-        output_video_path = f"output_videos/output_{video_id}.mp4"
+        output_video_path = f"output_videos/output_{video_id}{get_video_extension(codec)}"
         json_path = f"output_videos/statistics_{video_id}.json"
         excel_path = f"output_videos/statistics_{video_id}.xlsx"
         csv_path = f"output_videos/statistics_{video_id}.csv"
+        run_report_path = f"output_videos/run_report_{video_id}.json"
+        run_report = {'video_id': video_id, 'chunk_size': chunk_size}
+
+        # A one-off run loads each model once anyway, so it skips the warm-up
+        if model_registry is None:
+            model_registry = create_model_registry(warmup=False, onnx_threads=onnx_threads,
+                                                   court_optimization=court_optimization)
         
         print(f"Processing video: {input_video_path}")
         print(f"Output will be saved with ID: {video_id}")
         
-        # Read Video
-        print("Reading video...")
-        video_frames = read_video(input_video_path)
-        print(f"Total frames: {len(video_frames)}")
+        # Frames are streamed from disk in chunks of chunk_size, so only the
+        # first frame is kept around for the whole run
+        print("Reading first frame...")
+        first_frame = read_first_frame(input_video_path)
+        if first_frame is None:
+            raise ValueError(f"Could not read any frames from {input_video_path}")
+
+        # Court Line Detector model; keypoints are detected on every camera shot
+        # during the detection pass
+        print("Loading court line detector...")
+        court_line_detector = model_registry.get('court')
+        if court_line_detector.optimization == 'int8' and court_line_detector.compiled_model is None:
+            # Calibrate the INT8 activation ranges on frames spread over the video, not just the first one
+            calibration_frames = read_sampled_frames(input_video_path, num_frames=16)
+            if calibration_frames:
+                court_line_detector.calibrate(calibration_frames)
+        # Shots that do not look like the first frame's court view are not analysed
+        play_view_classifier = None
+        if play_view_max_distance is not None:
+            play_view_classifier = PlayViewClassifier(max_distance=play_view_max_distance)
+            play_view_classifier.set_reference(first_frame)
+        timeline_builder = CourtKeypointTimelineBuilder(court_line_detector, play_view_classifier=play_view_classifier)
 
         # Detect Players and Ball
         print("Initializing trackers...")
-        player_tracker = PlayerTracker(model_path='yolov8x')
-        ball_tracker = BallTracker(model_path='models/yolo5_last.pt')
-
-        print("Detecting players...")
-        player_detections = player_tracker.detect_frames(video_frames,
-                                                         read_from_stub=True,
-                                                         stub_path="tracker_stubs/player_detections.pkl"
-                                                         )
-        print("Detecting ball...")
-        ball_detections = ball_tracker.detect_frames(video_frames,
-                                                         read_from_stub=True,
-                                                         stub_path="tracker_stubs/ball_detections.pkl"
-                                                         )
-        print("Interpolating ball positions...")
-        ball_detections = ball_tracker.interpolate_ball_positions(ball_detections)
-        
-        # Court Line Detector model
-        print("Detecting court lines...")
-        court_model_path = "models/keypoints_model.pth"
-        court_line_detector = CourtLineDetector(court_model_path)
-        court_keypoints = court_line_detector.predict(video_frames[0])
+        model_suffix = '_onnx' if inference_backend == 'onnx' else ''
+        player_tracker = PlayerTracker(model_path=PLAYER_MODEL_PATH,
+                                       keyframe_interval=player_keyframe_interval,
+                                       model=model_registry.get(f'player{model_suffix}'),
+                                       backend=inference_backend,
+                                       static_frame_threshold=static_frame_threshold,
+                                       # Skip the crowd, umpire and ball kids: only look for players around the court
+                                       court_margin=player_court_margin)
+        ball_tracker = BallTracker(model_path=BALL_MODEL_PATH,
+                                   roi_size=ball_roi_size,
+                                   roi_lost_frames=ball_roi_lost_frames,
+                                   model=model_registry.get(f'ball{model_suffix}'),
+                                   backend=inference_backend,
+                                   static_frame_threshold=static_frame_threshold)
+        run_report['model_registry'] = model_registry.get_stats()
 
+        # Detections are cached by video content, model weights and inference settings
+        player_detections = None
+        ball_detections = None
+        court_keypoint_timeline = None
+        if use_cache:
+            print("Checking detection cache...")
+            detection_cache = DetectionCache(cache_dir, max_size_bytes=cache_size_mb*1024*1024)
+            video_hash = hash_file(input_video_path)
+            timeline_cache_key = detection_cache.make_key(video_hash, COURT_MODEL_PATH, timeline_builder.get_cache_params())
+            # Non-play shots get no detections, so the detections depend on the court timeline too
+            player_cache_key = detection_cache.make_key(video_hash, player_tracker.model_path,
+                                                        dict(player_tracker.get_cache_params(), court_timeline=timeline_cache_key))
+            ball_cache_key = detection_cache.make_key(video_hash, ball_tracker.model_path,
+                                                      dict(ball_tracker.get_cache_params(), court_timeline=timeline_cache_key))
+            player_detections = detection_cache.load(player_cache_key)
+            ball_detections = detection_cache.load(ball_cache_key)
+            court_keypoint_timeline = detection_cache.load(timeline_cache_key, table_class=CourtKeypointTimeline)
+            if court_keypoint_timeline is not None:
+                timeline_builder = None
+        run_report['detection_cache'] = {
+            'enabled': use_cache,
+            'player_hit': player_detections is not None,
+            'ball_hit': ball_detections is not None,
+            'court_timeline_hit': timeline_builder is None
+        }
+
+        detection_reader = PrefetchVideoReader(input_video_path, depth=prefetch_depth)
+        if player_detections is None or ball_detections is None or timeline_builder is not None:
+            print("Detecting players and ball...")
+            detected_players, detected_ball = detect_players_and_ball(detection_reader,
+                                                                      player_tracker if player_detections is None else None,
+                                                                      ball_tracker if ball_detections is None else None,
+                                                                      chunk_size,
+                                                                      ball_batch_size=ball_batch_size,
+                                                                      timeline_builder=timeline_builder,
+                                                                      court_keypoint_timeline=court_keypoint_timeline
+                                                                      )
+            if timeline_builder is not None:
+                court_keypoint_timeline = timeline_builder.timeline
+                if use_cache:
+                    detection_cache.save(timeline_cache_key, court_keypoint_timeline)
+            # Detections are kept in columnar form from here on
+            if player_detections is None:
+                player_detections = DetectionTable.from_frame_dicts(detected_players)
+                if use_cache:
+                    detection_cache.save(player_cache_key, player_detections)
+            if ball_detections is None:
+                ball_detections = DetectionTable.from_frame_dicts(detected_ball)
+                if use_cache:
+                    detection_cache.save(ball_cache_key, ball_detections)
+            if ball_tracker.roi_size:
+                run_report['ball_search'] = ball_tracker.get_search_stats()
+            if player_tracker.keyframe_interval:
+                run_report['player_keyframes'] = player_tracker.get_keyframe_stats()
+            if static_frame_threshold:
+                run_report['static_frame_reuse'] = {
+                    'threshold': static_frame_threshold,
+                    'player': None if run_report['detection_cache']['player_hit'] else player_tracker.get_reuse_stats(),
+                    'ball': None if run_report['detection_cache']['ball_hit'] else ball_tracker.get_reuse_stats()
+                }
+        else:
+            print("Using cached player and ball detections")
+        print(f"Camera shots: {len(court_keypoint_timeline)}")
+        run_report['court_shots'] = len(court_keypoint_timeline)
+        num_frames = len(ball_detections)
+        print(f"Total frames: {num_frames}")
+        run_report['num_frames'] = num_frames
+        run_report['detection_decode'] = detection_reader.get_stats()
+        play_mask = court_keypoint_timeline.get_play_mask(num_frames)
+        run_report['play_view'] = {
+            'non_play_shots': court_keypoint_timeline.is_play.count(False),
+            'non_play_frames': int((~play_mask).sum())
+        }
+        print(f"Non-play frames skipped: {run_report['play_view']['non_play_frames']}")
+
+        ball_shot_frames = None
+        if ball_smoothing == 'kalman':
+            # Hits are detected in the same pass, as soon as their lookahead frames are smoothed
+            print("Tracking ball positions and shots with a Kalman filter...")
+            ball_detections, ball_shot_frames = ball_tracker.track_ball_positions_and_shots(
+                ball_detections, play_mask=play_mask, max_gap=ball_max_gap)
+        else:
+            print("Interpolating ball positions...")
+            ball_detections = ball_tracker.interpolate_ball_positions(ball_detections)
+            # Gaps are filled across replays too; the ball is not on screen there
+            ball_detections = [ball_dict if is_play else {} for ball_dict, is_play in zip(ball_detections, play_mask)]
+        
         # Choose players
         print("Filtering players...")
-        player_detections = player_tracker.choose_and_filter_players(court_keypoints, player_detections)
+        player_detections = player_tracker.choose_and_filter_players(court_keypoint_timeline, player_detections)
 
         # MiniCourt
         print("Initializing mini court...")
-        mini_court = MiniCourt(video_frames[0]) 
+        mini_court = MiniCourt(first_frame)
 
         # Detect ball shots
-        print("Detecting ball shots...")
-        ball_shot_frames = ball_tracker.get_ball_shot_frames(ball_detections)
+        if ball_shot_frames is None:
+            print("Detecting ball shots...")
+            ball_shot_frames = ball_tracker.get_ball_shot_frames(ball_detections)
         print(f"Total shots detected: {len(ball_shot_frames)}")
 
         # Convert positions to mini court positions
         print("Converting to mini court coordinates...")
-        player_mini_court_detections, ball_mini_court_detections = mini_court.convert_bounding_boxes_to_mini_court_coordinates(
+        if mini_court_projection == 'homography':
+            convert_to_mini_court = mini_court.convert_bounding_boxes_to_mini_court_coordinates_with_homography
+        else:
+            convert_to_mini_court = mini_court.convert_bounding_boxes_to_mini_court_coordinates
+        player_mini_court_detections, ball_mini_court_detections = convert_to_mini_court(
             player_detections, 
             ball_detections,
-            court_keypoints
+            court_keypoint_timeline
         )
 
         # Initialize Enhanced Statistics Tracker
         print("Initializing enhanced statistics...")
-        enhanced_stats = EnhancedTennisStatistics(court_keypoints)
+        enhanced_stats = EnhancedTennisStatistics(court_keypoint_timeline)
         print("Enhanced Statistics Module Initialized")
 
         player_stats_data = [{
@@ -117,9 +327,9 @@ def main(input_video_path=None, video_id=None):
         
         # Track frame-by-frame positions
         print("Analyzing frame-by-frame positions...")
-        for frame_num in range(len(video_frames)):
+        for frame_num in range(num_frames):
             if frame_num % 100 == 0:
-                print(f"  Processing frame {frame_num}/{len(video_frames)}")
+                print(f"  Processing frame {frame_num}/{num_frames}")
                 
             player_dict = player_detections[frame_num] if frame_num < len(player_detections) else {}
             ball_dict = ball_detections[frame_num] if frame_num < len(ball_detections) else {}
@@ -252,13 +462,15 @@ def main(input_video_path=None, video_id=None):
 
         # End final rally if still active
         if current_rally_active:
-            enhanced_stats.end_rally(winner_id=player_shot_ball, rally_end_frame=len(video_frames)-1)
+            enhanced_stats.end_rally(winner_id=player_shot_ball, rally_end_frame=num_frames-1)
             print(f"Ended final rally")
         
         # Finalize enhanced statistics
         print("Calculating final statistics...")
         enhanced_stats.calculate_distances_in_meters()
         enhanced_stats.calculate_speed_stats(fps=24)
+        # Per-frame cumulative stats, so the overlay of each frame is a lookup
+        enhanced_stats.build_frame_index()
         
         enhanced_stats.print_summary()
         
@@ -279,7 +491,7 @@ def main(input_video_path=None, video_id=None):
         # Finalize dataframe stats
         print("Finalizing statistics dataframe...")
         player_stats_data_df = pd.DataFrame(player_stats_data)
-        frames_df = pd.DataFrame({'frame_num': list(range(len(video_frames)))})
+        frames_df = pd.DataFrame({'frame_num': list(range(num_frames))})
         player_stats_data_df = pd.merge(frames_df, player_stats_data_df, on='frame_num', how='left')
         player_stats_data_df = player_stats_data_df.ffill()
 
@@ -301,28 +513,49 @@ def main(input_video_path=None, video_id=None):
             if row['player_1_number_of_shots'] > 0 else 0, axis=1
         )
 
-        # Draw output
+        # Draw every layer onto one frame at a time, writing each frame straight to the video file
         print("Drawing output video...")
-        output_video_frames = player_tracker.draw_bboxes(video_frames, player_detections)
-        output_video_frames = ball_tracker.draw_bboxes(output_video_frames, ball_detections)
-        output_video_frames = court_line_detector.draw_keypoints_on_video(output_video_frames, court_keypoints)
-        output_video_frames = mini_court.draw_mini_court(output_video_frames)
-        output_video_frames = mini_court.draw_points_on_mini_court(output_video_frames, player_mini_court_detections)
-        output_video_frames = mini_court.draw_points_on_mini_court(output_video_frames, ball_mini_court_detections, color=(0,255,255))
-
-        # Draw enhanced statistics overlay with real-time updates
-        print("Adding enhanced statistics overlay (frame-by-frame)...")
-        for i in range(len(output_video_frames)):
-            if i % 100 == 0:
-                print(f"  Drawing frame {i}/{len(output_video_frames)}")
-            output_video_frames[i] = enhanced_stats.draw_enhanced_overlay(output_video_frames[i], player_id=1, frame_num=i)
-            output_video_frames[i] = enhanced_stats.draw_enhanced_overlay(output_video_frames[i], player_id=2, frame_num=i)
-
-        for i in range(len(output_video_frames)):
-            cv2.putText(output_video_frames[i], f"Frame: {i}", (10,30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-
-        print("Saving output video...")
-        save_video(output_video_frames, output_video_path)
+        frame_renderer = FrameRenderer([
+            PlayerBoxesLayer(player_tracker, player_detections),
+            BallBoxesLayer(ball_tracker, ball_detections),
+            CourtKeypointsLayer(court_line_detector, court_keypoint_timeline, play_mask),
+            MiniCourtLayer(mini_court, player_mini_court_detections, ball_mini_court_detections),
+            StatsOverlayLayer(enhanced_stats, player_ids=(1, 2)),
+            FrameNumberLayer()
+        ])
+        # Render workers are forked, so they start before the decoder and encoder threads
+        render_pool = frame_renderer.open_pool(first_frame.shape, workers=render_workers,
+                                               chunk_size=render_chunk_size)
+        video_writer = None
+        render_reader = PrefetchVideoReader(input_video_path, depth=prefetch_depth)
+        try:
+            video_writer = AsyncVideoWriter(output_video_path,
+                                            first_frame.shape[1],
+                                            first_frame.shape[0],
+                                            fps=get_video_fps(input_video_path),
+                                            codec=codec
+                                            )
+            frame_renderer.render_video(render_reader, video_writer, num_frames=num_frames, pool=render_pool)
+        finally:
+            render_reader.close()
+            if video_writer is not None:
+                video_writer.release()
+            if render_pool is not None:
+                render_pool.close()
+        run_report['render'] = frame_renderer.get_stats()
+        run_report['render_decode'] = render_reader.get_stats()
+        # A codec fallback may have changed the container
+        output_video_path = video_writer.output_video_path
+        run_report['encoder'] = {'codec': video_writer.codec,
+                                 'fps': video_writer.fps,
+                                 'frames_written': video_writer.frames_written}
+
+        print("Decoder prefetch stalls:")
+        for stage in ['detection_decode', 'render_decode']:
+            stats = run_report[stage]
+            print(f"  {stage}: decoder waited {stats['decoder_stalls']}x, consumer waited {stats['consumer_stalls']}x")
+        with open(run_report_path, 'w') as f:
+            json.dump(run_report, f, indent=4)
         
         print("\n" + "="*60)
         print("Analysis Complete!")
@@ -333,6 +566,7 @@ def main(input_video_path=None, video_id=None):
         print(f"   - {excel_path}")
         print(f"   - {csv_path}")
         print(f"   - {rally_path}")
+        print(f"   - {run_report_path}")
         print("="*60)
         
     except Exception as e:
@@ -352,7 +586,65 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Tennis Video Analysis')
     parser.add_argument('--input', type=str, help='Input video path')
     parser.add_argument('--video-id', type=str, help='Unique video ID for output files')
+    parser.add_argument('--chunk-size', type=int, default=64, help='Number of frames decoded and processed at a time')
+    parser.add_argument('--prefetch-depth', type=int, default=32, help='Number of frames decoded ahead on a background thread')
+    parser.add_argument('--ball-batch-size', type=int, default=8, help='Frames sent to the ball detector per predict call')
+    parser.add_argument('--ball-roi-size', type=int, default=None,
+                        help='Search the ball in a square crop of this size around its predicted position (default: full frame)')
+    parser.add_argument('--ball-roi-lost-frames', type=int, default=5,
+                        help='Frames without the ball before falling back to a full-frame search')
+    parser.add_argument('--player-keyframe-interval', type=int, default=None,
+                        help='Detect players every N frames and move their boxes with optical flow in between (default: every frame)')
+    parser.add_argument('--player-court-margin', type=float, default=None,
+                        help='Detect players only inside the court polygon grown by this fraction, e.g. 0.25 '
+                             '(default: the whole frame)')
+    parser.add_argument('--ball-smoothing', type=str, default='interpolate', choices=['interpolate', 'kalman'],
+                        help='Fill ball gaps by linear interpolation over the whole match or with a streaming Kalman filter, '
+                             'which fills a gap once the ball is seen again')
+    parser.add_argument('--ball-max-gap', type=int, default=15, help='Longest gap in frames the Kalman filter bridges')
+    parser.add_argument('--backend', type=str, default='ultralytics', choices=['ultralytics', 'onnx'],
+                        help='Inference backend of the player and ball detectors (onnx runs ONNX Runtime on CPU)')
+    parser.add_argument('--onnx-threads', type=int, default=None, help='Intra-op threads of the ONNX Runtime sessions')
+    parser.add_argument('--court-optimization', type=str, default='none', choices=['none', 'torchscript', 'int8'],
+                        help='Inference path of the court keypoint model')
+    parser.add_argument('--play-view-max-distance', type=float, default=0.35,
+                        help='Histogram distance to the first frame above which a camera shot is treated as non-play')
+    parser.add_argument('--no-play-view-filter', action='store_true', help='Analyse every camera shot')
+    parser.add_argument('--static-frame-threshold', type=float, default=None,
+                        help='Reuse the previous detections when no downscaled pixel changed by this much, e.g. 6 (off by default)')
+    parser.add_argument('--mini-court-projection', type=str, default='keypoint', choices=['keypoint', 'homography'],
+                        help='Map positions to the mini court via the nearest keypoint and player height, or via a court homography')
+    parser.add_argument('--render-workers', type=int, default=1,
+                        help='Processes drawing the output frames (0 uses every core)')
+    parser.add_argument('--render-chunk-size', type=int, default=8,
+                        help='Consecutive frames each render worker draws per task')
+    parser.add_argument('--cache-dir', type=str, default='tracker_cache', help='Directory of the detection cache')
+    parser.add_argument('--cache-size-mb', type=int, default=2048, help='Maximum size of the detection cache')
+    parser.add_argument('--no-cache', action='store_true', help='Always run detection and do not cache the results')
+    parser.add_argument('--codec', type=str, default='h264', choices=list(VIDEO_CODECS), help='Output video codec (h264/vp8 are web-playable)')
     
     args = parser.parse_args()
     
-    main(input_video_path=args.input, video_id=args.video_id)
+    main(input_video_path=args.input,
+         video_id=args.video_id,
+         chunk_size=args.chunk_size,
+         prefetch_depth=args.prefetch_depth,
+         codec=args.codec,
+         ball_batch_size=args.ball_batch_size,
+         cache_dir=args.cache_dir,
+         cache_size_mb=args.cache_size_mb,
+         use_cache=not args.no_cache,
+         ball_smoothing=args.ball_smoothing,
+         ball_max_gap=args.ball_max_gap,
+         ball_roi_size=args.ball_roi_size,
+         ball_roi_lost_frames=args.ball_roi_lost_frames,
+         player_keyframe_interval=args.player_keyframe_interval,
+         player_court_margin=args.player_court_margin,
+         inference_backend=args.backend,
+         onnx_threads=args.onnx_threads,
+         court_optimization=args.court_optimization,
+         play_view_max_distance=None if args.no_play_view_filter else args.play_view_max_distance,
+         static_frame_threshold=args.static_frame_threshold,
+         mini_court_projection=args.mini_court_projection,
+         render_workers=args.render_workers,
+         render_chunk_size=args.render_chunk_size)
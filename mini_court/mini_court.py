@@ -6,14 +6,35 @@ import constants
 from utils import (
     convert_meters_to_pixel_distance,
     convert_pixel_distance_to_meters,
-    get_foot_position,
-    get_closest_keypoint_index,
-    get_height_of_bbox,
     measure_xy_distance,
-    get_center_of_bbox,
-    measure_distance
+    DetectionTable,
+    CourtKeypointTimeline
 )
 
+def sliding_window_nanmax(values, before, after):
+    """
+    Maximum of values[max(0, i-before):min(N, i+after)] for every i, ignoring NaN
+    (NaN where the whole window is NaN). Van Herk/Gil-Werman: prefix and suffix
+    maxima over blocks of the window length give every window in O(N).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    num_values = len(values)
+    window = before + after
+    if num_values == 0:
+        return values.copy()
+
+    padded_length = -(-(num_values + window - 1) // window) * window
+    padded = np.full(padded_length, -np.inf)
+    padded[before:before + num_values] = np.where(np.isnan(values), -np.inf, values)
+    blocks = padded.reshape(-1, window)
+    prefix_max = np.maximum.accumulate(blocks, axis=1).reshape(-1)
+    suffix_max = np.maximum.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].reshape(-1)
+
+    # Window i covers padded[i:i+window]: the suffix of one block plus the prefix of the next
+    window_max = np.maximum(suffix_max[:num_values], prefix_max[window - 1:window - 1 + num_values])
+    window_max[np.isneginf(window_max)] = np.nan
+    return window_max
+
 class MiniCourt():
     def __init__(self,frame):
         self.drawing_rectangle_width = 250
@@ -25,6 +46,7 @@ class MiniCourt():
         self.set_mini_court_position()
         self.set_court_drawing_key_points()
         self.set_court_lines()
+        self.set_mini_court_sprite(frame)
 
 
     def convert_meters_to_pixels(self, meters):
@@ -138,11 +160,41 @@ class MiniCourt():
 
         return out
 
+    def set_mini_court_sprite(self, frame):
+        """
+        Pre-render the background rectangle and the court drawing once. The sprite
+        covers only the rectangle: a BGR colour layer plus an alpha layer that is
+        0.5 for the translucent white background and 1 where lines, keypoints and
+        the net are drawn. Compositing it gives the same pixels as
+        draw_background_rectangle followed by draw_court.
+        """
+        frame_height, frame_width = frame.shape[:2]
+        self.sprite_x1, self.sprite_y1 = max(self.start_x, 0), max(self.start_y, 0)
+        self.sprite_x2, self.sprite_y2 = min(self.end_x + 1, frame_width), min(self.end_y + 1, frame_height)
+
+        # Drawn pixels get the same colour on a black and on a white canvas
+        canvas_height, canvas_width = self.sprite_y2, self.sprite_x2
+        on_black = self.draw_court(np.zeros((canvas_height, canvas_width, 3), np.uint8))
+        on_white = self.draw_court(np.full((canvas_height, canvas_width, 3), 255, np.uint8))
+        region = (slice(self.sprite_y1, self.sprite_y2), slice(self.sprite_x1, self.sprite_x2))
+        drawn = (on_black[region] == on_white[region]).all(axis=2, keepdims=True)
+
+        self.sprite_color = on_white[region]
+        self.sprite_alpha = np.where(drawn, 1.0, 0.5).astype(np.float32)
+
+    def draw_mini_court_on_frame(self, frame):
+        """Blend the mini court sprite onto frame in place; only the sprite's region is touched."""
+        roi = frame[self.sprite_y1:self.sprite_y2, self.sprite_x1:self.sprite_x2]
+        blended = roi*(1 - self.sprite_alpha) + self.sprite_color*self.sprite_alpha
+        # Round half to even like cv2.addWeighted
+        np.rint(blended, out=blended)
+        roi[...] = blended
+        return frame
+
     def draw_mini_court(self,frames):
         output_frames = []
         for frame in frames:
-            frame = self.draw_background_rectangle(frame)
-            frame = self.draw_court(frame)
+            frame = self.draw_mini_court_on_frame(frame)
             output_frames.append(frame)
         return output_frames
 
@@ -186,67 +238,214 @@ class MiniCourt():
 
         return  mini_court_player_position
 
+    def get_player_box_arrays(self, player_boxes, player_ids=None):
+        """Per-player (N, 4) float arrays of boxes over all frames, NaN where the player is missing."""
+        if isinstance(player_boxes, DetectionTable):
+            if player_ids is None:
+                player_ids = player_boxes.get_track_ids()
+            return {player_id: player_boxes.boxes_for_track(player_id) for player_id in player_ids}
+
+        if player_ids is None:
+            player_ids = sorted({player_id for player_dict in player_boxes for player_id in player_dict})
+        boxes_by_player = {player_id: np.full((len(player_boxes), 4), np.nan) for player_id in player_ids}
+        for frame_num, player_dict in enumerate(player_boxes):
+            for player_id, bbox in player_dict.items():
+                if player_id in boxes_by_player:
+                    boxes_by_player[player_id][frame_num] = bbox
+        return boxes_by_player
+
+    def get_ball_box_array(self, ball_boxes, num_frames):
+        """(num_frames, 4) float array of ball boxes, NaN where the ball is missing."""
+        ball_array = np.full((num_frames, 4), np.nan)
+        for frame_num, ball_dict in enumerate(ball_boxes[:num_frames]):
+            if 1 in ball_dict:
+                ball_array[frame_num] = ball_dict[1]
+        return ball_array
+
+    def get_per_frame_keypoints(self, court_key_points, num_frames):
+        """(num_frames, 28) array with the court keypoints each frame is measured against."""
+        segments = self.get_keypoint_segments(court_key_points, num_frames)
+        dtype = np.result_type(*[np.asarray(keypoints).dtype for _, _, keypoints in segments])
+        keypoints_per_frame = np.empty((num_frames, 28), dtype=dtype)
+        for start, end, keypoints in segments:
+            keypoints_per_frame[start:end] = np.asarray(keypoints).reshape(-1)[:28]
+        return keypoints_per_frame
+
+    def get_mini_court_coordinates_array(self, positions, keypoints_per_frame, keypoint_indices,
+                                         player_heights_in_pixels, player_height_in_meters):
+        """
+        get_mini_court_coordinates over many frames at once: (N, 2) positions, the
+        (N, 28) keypoints of each frame, the closest keypoint index per frame and the
+        player height in pixels per frame. Computed in the same order as the per-frame
+        version; results match it to within float32 rounding, since scalar and array
+        arithmetic promote float32 keypoints differently on some NumPy versions.
+        """
+        dtype = keypoints_per_frame.dtype
+        frames = np.arange(len(positions))
+        closest_key_points_x = keypoints_per_frame[frames, keypoint_indices*2]
+        closest_key_points_y = keypoints_per_frame[frames, keypoint_indices*2+1]
+        distance_from_keypoint_x_pixels = np.abs(positions[:, 0].astype(dtype) - closest_key_points_x)
+        distance_from_keypoint_y_pixels = np.abs(positions[:, 1].astype(dtype) - closest_key_points_y)
+        player_height_in_meters = np.asarray(player_height_in_meters, dtype=dtype)
+
+        distance_from_keypoint_x_meters = distance_from_keypoint_x_pixels * player_height_in_meters / player_heights_in_pixels
+        distance_from_keypoint_y_meters = distance_from_keypoint_y_pixels * player_height_in_meters / player_heights_in_pixels
+
+        drawing_key_points = np.array(self.drawing_key_points, dtype=np.float64)
+        mini_court_x = drawing_key_points[keypoint_indices*2] + self.convert_meters_to_pixels(distance_from_keypoint_x_meters)
+        mini_court_y = drawing_key_points[keypoint_indices*2+1] + self.convert_meters_to_pixels(distance_from_keypoint_y_meters)
+        return np.stack([mini_court_x, mini_court_y], axis=1)
+
+    def get_closest_keypoint_indices(self, positions, keypoints_per_frame, keypoint_indices=(0, 2, 12, 13)):
+        """Vectorized get_closest_keypoint_index: per frame, the keypoint nearest in y (first one on ties)."""
+        keypoint_indices = np.array(keypoint_indices)
+        keypoints_y = keypoints_per_frame[:, keypoint_indices*2+1]
+        distances = np.abs(positions[:, 1:2].astype(keypoints_per_frame.dtype) - keypoints_y)
+        # Frames without keypoints have nothing to be closest to; their results are never used
+        distances = np.where(np.isnan(distances), np.inf, distances)
+        return keypoint_indices[np.argmin(distances, axis=1)]
+
     def convert_bounding_boxes_to_mini_court_coordinates(self,player_boxes, ball_boxes, original_court_key_points ):
+        """
+        Project players and ball onto the mini court, scaling pixel distances by
+        each player's tallest box within frames [frame-20, frame+50). original_court_key_points
+        is the keypoints for the whole video, or a CourtKeypointTimeline giving the
+        keypoints of the camera shot each frame belongs to.
+        player_boxes (frame dicts or a DetectionTable) and ball_boxes are turned into
+        arrays once; the window maximum is a linear-time sliding max over them.
+        """
+        num_frames = len(player_boxes)
         player_heights = {
             1: constants.PLAYER_1_HEIGHT_METERS,
             2: constants.PLAYER_2_HEIGHT_METERS
         }
-
-        output_player_boxes= []
-        output_ball_boxes= []
-
-        for frame_num, player_bbox in enumerate(player_boxes):
-            ball_box = ball_boxes[frame_num][1]
-            ball_position = get_center_of_bbox(ball_box)
-            closest_player_id_to_ball = min(player_bbox.keys(), key=lambda x: measure_distance(ball_position, get_center_of_bbox(player_bbox[x])))
-
-            output_player_bboxes_dict = {}
-            for player_id, bbox in player_bbox.items():
-                foot_position = get_foot_position(bbox)
-
-                # Get The closest keypoint in pixels
-                closest_key_point_index = get_closest_keypoint_index(foot_position,original_court_key_points, [0,2,12,13])
-                closest_key_point = (original_court_key_points[closest_key_point_index*2], 
-                                     original_court_key_points[closest_key_point_index*2+1])
-
-                # Get Player height in pixels
-                frame_index_min = max(0, frame_num-20)
-                frame_index_max = min(len(player_boxes), frame_num+50)
-                bboxes_heights_in_pixels = [get_height_of_bbox(player_boxes[i][player_id]) for i in range (frame_index_min,frame_index_max)]
-                max_player_height_in_pixels = max(bboxes_heights_in_pixels)
-
-                mini_court_player_position = self.get_mini_court_coordinates(foot_position,
-                                                                            closest_key_point, 
-                                                                            closest_key_point_index, 
-                                                                            max_player_height_in_pixels,
-                                                                            player_heights[player_id]
-                                                                            )
-                
-                output_player_bboxes_dict[player_id] = mini_court_player_position
-
-                if closest_player_id_to_ball == player_id:
-                    # Get The closest keypoint in pixels
-                    closest_key_point_index = get_closest_keypoint_index(ball_position,original_court_key_points, [0,2,12,13])
-                    closest_key_point = (original_court_key_points[closest_key_point_index*2], 
-                                        original_court_key_points[closest_key_point_index*2+1])
-                    
-                    mini_court_player_position = self.get_mini_court_coordinates(ball_position,
-                                                                            closest_key_point, 
-                                                                            closest_key_point_index, 
-                                                                            max_player_height_in_pixels,
-                                                                            player_heights[player_id]
-                                                                            )
-                    output_ball_boxes.append({1:mini_court_player_position})
-            output_player_boxes.append(output_player_bboxes_dict)
+        player_ids = list(player_heights.keys())
+        # Only players with a known height can be projected; do not drop anyone silently
+        if isinstance(player_boxes, DetectionTable):
+            track_ids = set(player_boxes.get_track_ids())
+        else:
+            track_ids = {track_id for player_dict in player_boxes for track_id in player_dict}
+        unknown_ids = sorted(track_ids - set(player_ids))
+        if unknown_ids:
+            raise KeyError(f"No player height for track ids {unknown_ids}; choose_and_filter_players should leave only players 1 and 2")
+        boxes_by_player = self.get_player_box_arrays(player_boxes, player_ids)
+        ball_array = self.get_ball_box_array(ball_boxes, num_frames)
+        keypoints_per_frame = self.get_per_frame_keypoints(original_court_key_points, num_frames)
+
+        # Ball centres, truncated to int like get_center_of_bbox
+        ball_positions = np.trunc(np.stack([(ball_array[:, 0] + ball_array[:, 2])/2,
+                                            (ball_array[:, 1] + ball_array[:, 3])/2], axis=1))
+        ball_keypoint_indices = self.get_closest_keypoint_indices(ball_positions, keypoints_per_frame)
+
+        output_player_boxes = [{} for _ in range(num_frames)]
+        player_max_heights = {}
+        ball_distances = {}
+        for player_id in player_ids:
+            boxes = boxes_by_player[player_id]
+            player_max_heights[player_id] = sliding_window_nanmax(boxes[:, 3] - boxes[:, 1], before=20, after=50)
+
+            # Foot positions, x truncated to int like get_foot_position
+            foot_positions = np.stack([np.trunc((boxes[:, 0] + boxes[:, 2])/2), boxes[:, 3]], axis=1)
+            keypoint_indices = self.get_closest_keypoint_indices(foot_positions, keypoints_per_frame)
+            with np.errstate(invalid='ignore'):
+                positions = self.get_mini_court_coordinates_array(foot_positions, keypoints_per_frame, keypoint_indices,
+                                                                  player_max_heights[player_id], player_heights[player_id])
+            for frame_num in np.flatnonzero(~np.isnan(boxes[:, 0])):
+                output_player_boxes[frame_num][player_id] = (positions[frame_num, 0], positions[frame_num, 1])
+
+            centers = np.trunc(np.stack([(boxes[:, 0] + boxes[:, 2])/2, (boxes[:, 1] + boxes[:, 3])/2], axis=1))
+            distances = np.sqrt(((ball_positions - centers)**2).sum(axis=1))
+            ball_distances[player_id] = np.where(np.isnan(distances), np.inf, distances)
+
+        # The ball is projected with the height of the player closest to it
+        distances = np.stack([ball_distances[player_id] for player_id in player_ids], axis=1)
+        closest_players = np.argmin(distances, axis=1)
+        has_ball = ~np.isnan(ball_array[:, 0]) & np.isfinite(distances).any(axis=1)
+        max_heights = np.stack([player_max_heights[player_id] for player_id in player_ids], axis=1)
+        closest_player_heights = max_heights[np.arange(num_frames), closest_players]
+        closest_player_heights_in_meters = np.array([player_heights[player_id] for player_id in player_ids])[closest_players]
+        with np.errstate(invalid='ignore'):
+            ball_mini_court_positions = self.get_mini_court_coordinates_array(ball_positions, keypoints_per_frame, ball_keypoint_indices,
+                                                                              closest_player_heights, closest_player_heights_in_meters)
+        output_ball_boxes = [{1: (ball_mini_court_positions[frame_num, 0], ball_mini_court_positions[frame_num, 1])} if has_ball[frame_num] else {}
+                             for frame_num in range(num_frames)]
 
         return output_player_boxes , output_ball_boxes
     
+    def get_court_homography(self, court_key_points):
+        """Homography from the 14 detected court keypoints to drawing_key_points, or None."""
+        source_points = np.asarray(court_key_points, dtype=np.float32).reshape(-1, 2)
+        if np.isnan(source_points).any():
+            return None
+        destination_points = np.asarray(self.drawing_key_points, dtype=np.float32).reshape(-1, 2)
+        # RANSAC keeps one badly placed keypoint from skewing the whole court
+        homography, _ = cv2.findHomography(source_points, destination_points, cv2.RANSAC, 5.0)
+        return homography
+
+    def get_keypoint_segments(self, court_key_points, num_frames):
+        """(start_frame, end_frame, keypoints) for each stretch of frames sharing one set of keypoints."""
+        if not isinstance(court_key_points, CourtKeypointTimeline):
+            return [(0, num_frames, court_key_points)]
+        segment_ends = court_key_points.start_frames[1:] + [num_frames]
+        return [(start, min(end, num_frames), keypoints)
+                for start, end, keypoints in zip(court_key_points.start_frames, segment_ends, court_key_points.keypoints)
+                if start < num_frames]
+
+    def convert_bounding_boxes_to_mini_court_coordinates_with_homography(self, player_boxes, ball_boxes, original_court_key_points):
+        """
+        Same output as convert_bounding_boxes_to_mini_court_coordinates, but every
+        position is mapped through the court plane homography: player feet and
+        ball centres of a whole segment go through one cv2.perspectiveTransform call.
+        original_court_key_points is one keypoint array or a CourtKeypointTimeline
+        (one homography per segment). The ball is projected onto the ground plane
+        wherever it is detected.
+        """
+        num_frames = len(player_boxes)
+
+        boxes_by_player = self.get_player_box_arrays(player_boxes)
+        player_ids = list(boxes_by_player.keys())
+        ball_array = self.get_ball_box_array(ball_boxes, num_frames)
+
+        # Foot positions (bottom centre) and ball centres, NaN where missing
+        feet = {player_id: np.stack([(boxes[:, 0] + boxes[:, 2])/2, boxes[:, 3]], axis=1)
+                for player_id, boxes in boxes_by_player.items()}
+        ball_centers = np.stack([(ball_array[:, 0] + ball_array[:, 2])/2, (ball_array[:, 1] + ball_array[:, 3])/2], axis=1)
+
+        projected_feet = {player_id: np.full((num_frames, 2), np.nan) for player_id in player_ids}
+        projected_ball = np.full((num_frames, 2), np.nan)
+        for start, end, court_key_points in self.get_keypoint_segments(original_court_key_points, num_frames):
+            homography = self.get_court_homography(court_key_points)
+            if homography is None:
+                continue
+            for player_id in player_ids:
+                projected_feet[player_id][start:end] = self.project_points(feet[player_id][start:end], homography)
+            projected_ball[start:end] = self.project_points(ball_centers[start:end], homography)
+
+        output_player_boxes = [{} for _ in range(num_frames)]
+        for player_id in player_ids:
+            for frame_num in np.flatnonzero(~np.isnan(projected_feet[player_id][:, 0])):
+                x, y = projected_feet[player_id][frame_num]
+                output_player_boxes[frame_num][player_id] = (float(x), float(y))
+        output_ball_boxes = [{1: (float(x), float(y))} if not np.isnan(x) else {} for x, y in projected_ball]
+
+        return output_player_boxes, output_ball_boxes
+
+    def project_points(self, points, homography):
+        """Map an (N, 2) array of frame points through homography; NaN rows stay NaN."""
+        if len(points) == 0:
+            return points
+        return cv2.perspectiveTransform(points.reshape(-1, 1, 2).astype(np.float64), homography).reshape(-1, 2)
+
     def draw_points_on_mini_court(self,frames,postions, color=(0,255,0)):
         for frame_num, frame in enumerate(frames):
-            for _, position in postions[frame_num].items():
-                x,y = position
-                x= int(x)
-                y= int(y)
-                cv2.circle(frame, (x,y), 5, color, -1)
+            self.draw_points_on_frame(frame, postions[frame_num], color=color)
         return frames
 
+    def draw_points_on_frame(self, frame, positions, color=(0,255,0)):
+        for _, position in positions.items():
+            x,y = position
+            x= int(x)
+            y= int(y)
+            cv2.circle(frame, (x,y), 5, color, -1)
+        return frame
+
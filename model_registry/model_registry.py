@@ -0,0 +1,153 @@
+import gc
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import torch
+except ImportError:
+    torch = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+def estimate_model_bytes(model):
+    """Bytes held by the parameters and buffers of the torch modules inside model."""
+    # Non-torch models (ONNX Runtime sessions) report their own size
+    if hasattr(model, 'get_nbytes'):
+        return model.get_nbytes()
+    if torch is None:
+        return 0
+    # Wrappers (YOLO, CourtLineDetector, trackers) keep their network in .model
+    depth = 0
+    while not isinstance(model, torch.nn.Module) and hasattr(model, 'model') and depth < 4:
+        model = model.model
+        depth += 1
+    if not isinstance(model, torch.nn.Module):
+        return 0
+
+    nbytes = sum(p.numel() * p.element_size() for p in model.parameters())
+    nbytes += sum(b.numel() * b.element_size() for b in model.buffers())
+    return nbytes
+
+class ModelRegistry:
+    """
+    Process-wide store of loaded models, so a long-running worker pays the
+    weight loading and warm-up cost once instead of once per job.
+
+    Models are registered by name with a loader (and an optional warm-up
+    function run once on the fresh instance). get() loads on first use and
+    then hands the same instance to every caller. The registry tracks the
+    memory held by each model; when the total goes over max_memory_bytes, or
+    the machine has less than min_available_bytes free, the least recently
+    used models are unloaded. An unloaded model is simply loaded again on its
+    next get(). The trackers take an already loaded model from get() through
+    their model argument instead of loading their own.
+    """
+
+    def __init__(self, max_memory_bytes=None, min_available_bytes=None, warmup=True):
+        self.max_memory_bytes = max_memory_bytes
+        self.min_available_bytes = min_available_bytes
+        self.warmup = warmup
+        self._loaders = {}
+        self._models = OrderedDict()
+        self._memory_bytes = {}
+        self._lock = threading.RLock()
+        self.loads = 0
+        self.hits = 0
+        self.evictions = 0
+        self.load_seconds = 0.0
+
+    def register(self, name, loader, warmup=None):
+        with self._lock:
+            self._loaders[name] = (loader, warmup)
+
+    def get(self, name):
+        with self._lock:
+            if name in self._models:
+                self._models.move_to_end(name)
+                self.hits += 1
+                return self._models[name]
+
+            if name not in self._loaders:
+                raise KeyError(f"Unknown model '{name}'. Registered: {', '.join(self._loaders)}")
+
+            # Make room before loading when the machine is already short on memory
+            self._evict(keep=None)
+
+            loader, warmup = self._loaders[name]
+            start = time.perf_counter()
+            model = loader()
+            if self.warmup and warmup is not None:
+                warmup(model)
+            self.load_seconds += time.perf_counter() - start
+            self.loads += 1
+
+            self._models[name] = model
+            self._memory_bytes[name] = estimate_model_bytes(model)
+            self._evict(keep=name)
+            return model
+
+    def is_loaded(self, name):
+        with self._lock:
+            return name in self._models
+
+    def unload(self, name):
+        with self._lock:
+            if name not in self._models:
+                return False
+            del self._models[name]
+            del self._memory_bytes[name]
+        self._release_memory()
+        return True
+
+    def unload_all(self):
+        with self._lock:
+            self._models.clear()
+            self._memory_bytes.clear()
+        self._release_memory()
+
+    def get_memory_bytes(self):
+        with self._lock:
+            return sum(self._memory_bytes.values())
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                'loaded': dict(self._memory_bytes),
+                'memory_bytes': sum(self._memory_bytes.values()),
+                'loads': self.loads,
+                'hits': self.hits,
+                'evictions': self.evictions,
+                'load_seconds': round(self.load_seconds, 3)
+            }
+
+    def _is_memory_tight(self):
+        if self.max_memory_bytes is not None and sum(self._memory_bytes.values()) > self.max_memory_bytes:
+            return True
+        if self.min_available_bytes is not None and psutil is not None:
+            return psutil.virtual_memory().available < self.min_available_bytes
+        return False
+
+    def _evict(self, keep):
+        evicted = False
+        while self._is_memory_tight():
+            candidates = [name for name in self._models if name != keep]
+            if not candidates:
+                break
+            # OrderedDict keeps the least recently used model first
+            del self._models[candidates[0]]
+            del self._memory_bytes[candidates[0]]
+            self.evictions += 1
+            evicted = True
+            if self.min_available_bytes is not None:
+                self._release_memory()
+        if evicted:
+            self._release_memory()
+
+    def _release_memory(self):
+        gc.collect()
+        if torch is not None and torch.cuda.is_available():
+            torch.cuda.empty_cache()
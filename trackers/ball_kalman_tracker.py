@@ -0,0 +1,131 @@
+import numpy as np
+
+class BallKalmanTracker:
+    """
+    Streaming Kalman filter over the ball centre, run one frame at a time.
+
+    update() takes the ball bbox detected in the next frame (None/[] when the
+    detector missed it) and returns the filtered bbox. Missed frames are filled
+    with the filter's prediction for up to max_gap frames; after that the ball
+    is considered lost, None is returned and the filter restarts on the next
+    detection. Detections far outside the predicted position (Mahalanobis gate)
+    are treated as misses, which suppresses single-frame false positives; if
+    the ball keeps being detected there (a hit reversing its direction), the
+    filter re-acquires it after reacquire_after frames.
+
+    motion_model is 'constant_velocity' (state x, y, vx, vy) or
+    'constant_acceleration' (state x, y, vx, vy, ax, ay).
+    Every update is a handful of fixed-size matrix products, O(1) per frame.
+    """
+    MOTION_MODELS = ['constant_velocity', 'constant_acceleration']
+
+    def __init__(self, max_gap=15, motion_model='constant_velocity',
+                 process_noise=25.0, measurement_noise=4.0, gate_threshold=25.0, reacquire_after=2,
+                 size_smoothing=0.5):
+        if motion_model not in self.MOTION_MODELS:
+            raise ValueError(f"Unknown motion model '{motion_model}'. Available: {', '.join(self.MOTION_MODELS)}")
+
+        self.max_gap = max_gap
+        self.motion_model = motion_model
+        self.gate_threshold = gate_threshold
+        self.reacquire_after = reacquire_after
+        self.size_smoothing = size_smoothing
+
+        dim = 4 if motion_model == 'constant_velocity' else 6
+        self.F = np.eye(dim)
+        self.F[0, 2] = self.F[1, 3] = 1.0
+        if dim == 6:
+            self.F[0, 4] = self.F[1, 5] = 0.5
+            self.F[2, 4] = self.F[3, 5] = 1.0
+        self.H = np.zeros((2, dim))
+        self.H[0, 0] = self.H[1, 1] = 1.0
+        self.Q = np.eye(dim) * process_noise
+        self.R = np.eye(2) * measurement_noise
+        self.reset()
+
+    def reset(self):
+        self.state = None
+        self.covariance = None
+        self.size = None
+        self.missed_frames = 0
+        self.rejected_detections = 0
+
+    @property
+    def is_tracking(self):
+        return self.state is not None
+
+    def update(self, ball_bbox):
+        has_detection = ball_bbox is not None and len(ball_bbox) == 4
+
+        if self.state is None:
+            if not has_detection:
+                return None
+            self._initialize(ball_bbox)
+            return list(ball_bbox)
+
+        self._predict()
+
+        if has_detection and self._is_within_gate(ball_bbox):
+            self._correct(ball_bbox)
+            self.missed_frames = 0
+            self.rejected_detections = 0
+        else:
+            self.missed_frames += 1
+            if has_detection:
+                self.rejected_detections += 1
+            if self.missed_frames > self.max_gap or self.rejected_detections >= self.reacquire_after:
+                self.reset()
+                if has_detection:
+                    self._initialize(ball_bbox)
+                    return list(ball_bbox)
+                return None
+
+        return self._get_bbox(self.state[0], self.state[1])
+
+    def predict_next(self):
+        """Expected ball bbox in the next frame, or None when the ball is not tracked."""
+        if self.state is None:
+            return None
+        next_state = self.F @ self.state
+        return self._get_bbox(next_state[0], next_state[1])
+
+    def _initialize(self, ball_bbox):
+        x1, y1, x2, y2 = ball_bbox
+        self.state = np.zeros(self.F.shape[0])
+        self.state[0] = (x1 + x2)/2
+        self.state[1] = (y1 + y2)/2
+        # position is known, velocity/acceleration are not
+        self.covariance = np.eye(self.F.shape[0]) * 1000.0
+        self.covariance[0, 0] = self.covariance[1, 1] = self.R[0, 0]
+        self.size = np.array([x2 - x1, y2 - y1], dtype=float)
+        self.missed_frames = 0
+        self.rejected_detections = 0
+
+    def _predict(self):
+        self.state = self.F @ self.state
+        self.covariance = self.F @ self.covariance @ self.F.T + self.Q
+
+    def _is_within_gate(self, ball_bbox):
+        residual = self._get_measurement(ball_bbox) - self.H @ self.state
+        innovation_covariance = self.H @ self.covariance @ self.H.T + self.R
+        distance = residual @ np.linalg.solve(innovation_covariance, residual)
+        return distance <= self.gate_threshold
+
+    def _correct(self, ball_bbox):
+        residual = self._get_measurement(ball_bbox) - self.H @ self.state
+        innovation_covariance = self.H @ self.covariance @ self.H.T + self.R
+        gain = self.covariance @ self.H.T @ np.linalg.inv(innovation_covariance)
+        self.state = self.state + gain @ residual
+        self.covariance = (np.eye(self.F.shape[0]) - gain @ self.H) @ self.covariance
+
+        x1, y1, x2, y2 = ball_bbox
+        self.size = (1 - self.size_smoothing)*self.size + self.size_smoothing*np.array([x2 - x1, y2 - y1])
+
+    def _get_measurement(self, ball_bbox):
+        x1, y1, x2, y2 = ball_bbox
+        return np.array([(x1 + x2)/2, (y1 + y2)/2])
+
+    def _get_bbox(self, center_x, center_y):
+        half_width, half_height = self.size/2
+        return [float(center_x - half_width), float(center_y - half_height),
+                float(center_x + half_width), float(center_y + half_height)]
@@ -0,0 +1,71 @@
+from collections import deque
+import math
+
+class OnlineBallShotDetector:
+    """
+    Streaming version of BallTracker.get_ball_shot_frames.
+
+    Feed one (interpolated) ball bbox per frame to update(). A hit at frame i is
+    confirmed once the direction change has been checked against the following
+    `lookahead` frames, so it is reported when frame i + lookahead arrives.
+    Only the last few mid-y values and lookahead + 1 deltas are kept, so memory
+    does not grow with the video, and each update is O(1) apart from the
+    5-frame rolling mean.
+    Fed the same positions, it reports exactly the frames get_ball_shot_frames returns.
+    """
+
+    def __init__(self, minimum_change_frames_for_hit=25, rolling_window=5):
+        self.minimum_change_frames_for_hit = minimum_change_frames_for_hit
+        self.lookahead = int(minimum_change_frames_for_hit*1.2)
+        self.rolling_window = rolling_window
+        self.reset()
+
+    def reset(self):
+        self.frame_num = -1
+        self._mid_ys = deque(maxlen=self.rolling_window)
+        self._previous_rolling_mean = math.nan
+        # delta_y of frames [frame_num - lookahead, frame_num]
+        self._delta_ys = deque()
+        self._up_total = 0
+        self._down_total = 0
+
+    def update(self, ball_bbox):
+        """
+        Add the ball bbox ([x1, y1, x2, y2], or None/[] when missing) of the next frame.
+        Returns the frame number of a newly confirmed hit, or None.
+        """
+        self.frame_num += 1
+
+        mid_y = (ball_bbox[1] + ball_bbox[3])/2 if ball_bbox is not None and len(ball_bbox) == 4 else math.nan
+        self._mid_ys.append(mid_y)
+        known_mid_ys = [y for y in self._mid_ys if not math.isnan(y)]
+        rolling_mean = sum(known_mid_ys)/len(known_mid_ys) if known_mid_ys else math.nan
+        delta_y = rolling_mean - self._previous_rolling_mean
+        self._previous_rolling_mean = rolling_mean
+
+        if len(self._delta_ys) == self.lookahead + 1:
+            self._remove_delta(self._delta_ys.popleft())
+        self._delta_ys.append(delta_y)
+        self._up_total += delta_y < 0
+        self._down_total += delta_y > 0
+
+        candidate_frame = self.frame_num - self.lookahead
+        if candidate_frame < 1:
+            return None
+
+        candidate_delta, next_delta = self._delta_ys[0], self._delta_ys[1]
+        # counts over the lookahead frames after the candidate
+        up_in_window = self._up_total - (candidate_delta < 0)
+        down_in_window = self._down_total - (candidate_delta > 0)
+
+        negative_position_change = candidate_delta > 0 and next_delta < 0
+        positive_position_change = candidate_delta < 0 and next_delta > 0
+        if ((negative_position_change and up_in_window >= self.minimum_change_frames_for_hit) or
+                (positive_position_change and down_in_window >= self.minimum_change_frames_for_hit)):
+            return candidate_frame
+
+        return None
+
+    def _remove_delta(self, delta_y):
+        self._up_total -= delta_y < 0
+        self._down_total -= delta_y > 0
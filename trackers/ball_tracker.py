@@ -2,13 +2,64 @@ from ultralytics import YOLO
 import cv2
 import pickle
 import pandas as pd
+import numpy as np
+import sys
+sys.path.append('../')
+from utils import chunk_frames, DetectionTable, StaticFrameGate
+from inference_backends import OnnxYoloDetector
+from .ball_kalman_tracker import BallKalmanTracker
+from .ball_shot_detector import OnlineBallShotDetector
 
 class BallTracker:
-    def __init__(self,model_path):
-        self.model = YOLO(model_path)
+    def __init__(self,model_path, conf=0.15, imgsz=640, roi_size=None, roi_lost_frames=5, model=None,
+                 backend='ultralytics', onnx_threads=None, static_frame_threshold=None):
+        self.model_path = model_path
+        # backend: 'ultralytics' (PyTorch) or 'onnx' (ONNX Runtime on CPU)
+        self.backend = backend
+        if model is None:
+            model = OnnxYoloDetector(model_path, intra_op_threads=onnx_threads) if backend == 'onnx' else YOLO(model_path)
+        self.model = model
+        self.conf = conf
+        self.imgsz = imgsz
+
+        # ROI mode: search a roi_size x roi_size crop around the predicted ball position
+        # and go back to full-frame search once the ball has been missed for roi_lost_frames
+        self.roi_size = roi_size
+        self.roi_lost_frames = roi_lost_frames
+
+        self.static_frame_gate = StaticFrameGate(static_frame_threshold)
+        self.reset()
+
+    def reset(self):
+        self.roi_tracker = BallKalmanTracker(max_gap=self.roi_lost_frames)
+        self.roi_searches = 0
+        self.full_frame_searches = 0
+        self.static_frame_gate.reset()
+
+    def get_cache_params(self):
+        params = {'tracker': 'ball', 'conf': self.conf, 'imgsz': self.imgsz}
+        if self.backend != 'ultralytics':
+            params['backend'] = self.backend
+        if self.roi_size:
+            params['roi_size'] = self.roi_size
+            params['roi_lost_frames'] = self.roi_lost_frames
+        if self.static_frame_gate.is_enabled():
+            params['static_frame_threshold'] = self.static_frame_gate.threshold
+        return params
+
+    def get_reuse_stats(self):
+        return self.static_frame_gate.get_stats()
+
+    def get_search_stats(self):
+        return {'roi_searches': self.roi_searches, 'full_frame_searches': self.full_frame_searches}
+
+    def get_ball_boxes(self, ball_positions):
+        if isinstance(ball_positions, DetectionTable):
+            return ball_positions.boxes_for_track(1)
+        return [x.get(1,[]) for x in ball_positions]
 
     def interpolate_ball_positions(self, ball_positions):
-        ball_positions = [x.get(1,[]) for x in ball_positions]
+        ball_positions = self.get_ball_boxes(ball_positions)
         # convert the list into pandas dataframe
         df_ball_positions = pd.DataFrame(ball_positions,columns=['x1','y1','x2','y2'])
 
@@ -20,40 +71,116 @@ class BallTracker:
 
         return ball_positions
 
+    def smooth_ball_positions(self, ball_positions, max_gap=15, motion_model='constant_velocity'):
+        """
+        Streaming alternative to interpolate_ball_positions: a Kalman filter smooths
+        jitter one frame at a time and gaps of up to max_gap frames are filled, see
+        iter_smoothed_ball_boxes. Frames where the ball is lost come back as {}.
+        """
+        return [{1: ball_bbox} if ball_bbox is not None else {}
+                for ball_bbox in self.iter_smoothed_ball_boxes(ball_positions, max_gap, motion_model)]
+
+    def iter_smoothed_ball_boxes(self, ball_positions, max_gap=15, motion_model='constant_velocity'):
+        """
+        Kalman-filtered ball bbox (None when lost) of each frame, in order.
+
+        Frames where the filter only predicts are held back until the next measured
+        frame and then filled by linear interpolation between the measured frames on
+        either side. Coasting on the prediction would carry on past a hit the
+        detector missed and then jump back on re-acquisition, which reads as extra
+        direction changes. Held frames are released as predicted when the ball is
+        lost, so output lags by at most max_gap frames.
+        """
+        ball_kalman_tracker = BallKalmanTracker(max_gap=max_gap, motion_model=motion_model)
+        predicted_boxes = []
+        last_measured_bbox = None
+        for ball_bbox in self.get_ball_boxes(ball_positions):
+            if len(ball_bbox) == 0 or np.isnan(ball_bbox[0]):
+                ball_bbox = None
+            ball_bbox = ball_kalman_tracker.update(ball_bbox)
+
+            if ball_bbox is None:
+                yield from predicted_boxes
+                predicted_boxes = []
+                last_measured_bbox = None
+                yield None
+            elif ball_kalman_tracker.missed_frames > 0:
+                predicted_boxes.append(ball_bbox)
+            else:
+                if last_measured_bbox is None:
+                    yield from predicted_boxes
+                else:
+                    steps = len(predicted_boxes) + 1
+                    for step in range(1, steps):
+                        yield [start + (end - start)*step/steps for start, end in zip(last_measured_bbox, ball_bbox)]
+                predicted_boxes = []
+                last_measured_bbox = ball_bbox
+                yield ball_bbox
+        yield from predicted_boxes
+
+    def track_ball_positions_and_shots(self, ball_positions, play_mask=None, max_gap=15,
+                                       motion_model='constant_velocity'):
+        """
+        smooth_ball_positions and get_ball_shot_frames in one streaming pass: each
+        smoothed position (blanked where play_mask is False) goes straight to an
+        OnlineBallShotDetector, which confirms a hit once its lookahead frames are in.
+        Returns (ball_positions, ball_shot_frames); the hits are the ones
+        get_ball_shot_frames finds on the returned positions.
+        """
+        shot_detector = OnlineBallShotDetector()
+
+        smoothed_ball_positions = []
+        ball_shot_frames = []
+        for frame_num, ball_bbox in enumerate(self.iter_smoothed_ball_boxes(ball_positions, max_gap, motion_model)):
+            # The ball is not on screen outside play; the filter still runs through it
+            if play_mask is not None and not play_mask[frame_num]:
+                ball_bbox = None
+            smoothed_ball_positions.append({1: ball_bbox} if ball_bbox is not None else {})
+            hit_frame = shot_detector.update(ball_bbox)
+            if hit_frame is not None:
+                ball_shot_frames.append(hit_frame)
+
+        return smoothed_ball_positions, ball_shot_frames
+
     def get_ball_shot_frames(self,ball_positions):
-        ball_positions = [x.get(1,[]) for x in ball_positions]
+        ball_positions = self.get_ball_boxes(ball_positions)
         # convert the list into pandas dataframe
         df_ball_positions = pd.DataFrame(ball_positions,columns=['x1','y1','x2','y2'])
 
-        df_ball_positions['ball_hit'] = 0
-
         df_ball_positions['mid_y'] = (df_ball_positions['y1'] + df_ball_positions['y2'])/2
         df_ball_positions['mid_y_rolling_mean'] = df_ball_positions['mid_y'].rolling(window=5, min_periods=1, center=False).mean()
         df_ball_positions['delta_y'] = df_ball_positions['mid_y_rolling_mean'].diff()
+        delta_y = df_ball_positions['delta_y'].to_numpy()
+
+        # A hit is a frame where the vertical direction flips and the new direction
+        # persists for at least minimum_change_frames_for_hit of the following frames
         minimum_change_frames_for_hit = 25
-        for i in range(1,len(df_ball_positions)- int(minimum_change_frames_for_hit*1.2) ):
-            negative_position_change = df_ball_positions['delta_y'].iloc[i] >0 and df_ball_positions['delta_y'].iloc[i+1] <0
-            positive_position_change = df_ball_positions['delta_y'].iloc[i] <0 and df_ball_positions['delta_y'].iloc[i+1] >0
-
-            if negative_position_change or positive_position_change:
-                change_count = 0 
-                for change_frame in range(i+1, i+int(minimum_change_frames_for_hit*1.2)+1):
-                    negative_position_change_following_frame = df_ball_positions['delta_y'].iloc[i] >0 and df_ball_positions['delta_y'].iloc[change_frame] <0
-                    positive_position_change_following_frame = df_ball_positions['delta_y'].iloc[i] <0 and df_ball_positions['delta_y'].iloc[change_frame] >0
-
-                    if negative_position_change and negative_position_change_following_frame:
-                        change_count+=1
-                    elif positive_position_change and positive_position_change_following_frame:
-                        change_count+=1
-            
-                if change_count>minimum_change_frames_for_hit-1:
-                    df_ball_positions['ball_hit'].iloc[i] = 1
-
-        frame_nums_with_ball_hits = df_ball_positions[df_ball_positions['ball_hit']==1].index.tolist()
+        window = int(minimum_change_frames_for_hit*1.2)
+        num_candidates = len(delta_y) - window - 1
+        if num_candidates <= 0:
+            return []
+
+        moving_down = delta_y > 0
+        moving_up = delta_y < 0
+        candidates = np.arange(1, 1 + num_candidates)
+
+        # Number of up/down frames in delta_y[i+1 : i+window+1], via cumulative sums
+        up_counts = np.concatenate(([0], np.cumsum(moving_up)))
+        down_counts = np.concatenate(([0], np.cumsum(moving_down)))
+        up_in_window = up_counts[candidates + window + 1] - up_counts[candidates + 1]
+        down_in_window = down_counts[candidates + window + 1] - down_counts[candidates + 1]
+
+        negative_position_change = moving_down[candidates] & moving_up[candidates + 1]
+        positive_position_change = moving_up[candidates] & moving_down[candidates + 1]
+
+        ball_hit = ((negative_position_change & (up_in_window >= minimum_change_frames_for_hit)) |
+                    (positive_position_change & (down_in_window >= minimum_change_frames_for_hit)))
+
+        frame_nums_with_ball_hits = candidates[ball_hit].tolist()
 
         return frame_nums_with_ball_hits
 
-    def detect_frames(self,frames, read_from_stub=False, stub_path=None):
+    def detect_frames(self,frames, read_from_stub=False, stub_path=None, batch_size=1):
         ball_detections = []
 
         if read_from_stub and stub_path is not None:
@@ -61,9 +188,13 @@ class BallTracker:
                 ball_detections = pickle.load(f)
             return ball_detections
 
-        for frame in frames:
-            player_dict = self.detect_frame(frame)
-            ball_detections.append(player_dict)
+        # Each crop depends on the previous detection, so ROI search runs frame by frame;
+        # otherwise batch_size frames go to each predict call to amortize the per-call overhead
+        for batch in chunk_frames(frames, 1 if self.roi_size else batch_size):
+            # Static frames reuse the detections of the last inferred frame before them;
+            # in ROI mode the reused box still steps the motion model the crop follows
+            ball_detections.extend(self.static_frame_gate.detect(
+                batch, self.detect_many, on_reuse=self.update_roi_tracker if self.roi_size else None))
         
         if stub_path is not None:
             with open(stub_path, 'wb') as f:
@@ -71,27 +202,80 @@ class BallTracker:
         
         return ball_detections
 
+    def detect_many(self, frames):
+        if self.roi_size:
+            return [self.detect_frame_roi(frame) for frame in frames]
+        if len(frames) == 1:
+            return [self.detect_frame(frames[0])]
+        return self.detect_batch(frames)
+
+    def update_roi_tracker(self, ball_dict):
+        self.roi_tracker.update(ball_dict.get(1))
+
+    def predict(self, frames, imgsz):
+        """(N, 4) xyxy boxes for each frame, sorted by confidence, from the configured backend."""
+        if self.backend == 'onnx':
+            return [results.xyxy for results in self.model.predict(frames, conf=self.conf, imgsz=imgsz)]
+        results = self.model.predict(frames, conf=self.conf, imgsz=imgsz)
+        return [result.boxes.xyxy.cpu().numpy() for result in results]
+
     def detect_frame(self,frame):
-        results = self.model.predict(frame,conf=0.15)[0]
+        boxes = self.predict(frame, self.imgsz)[0]
+        return self.get_ball_dict(boxes)
 
+    def detect_frame_roi(self,frame):
+        predicted_bbox = self.roi_tracker.predict_next()
+        if predicted_bbox is None:
+            self.full_frame_searches += 1
+            ball_dict = self.detect_frame(frame)
+        else:
+            self.roi_searches += 1
+            x1, y1, x2, y2 = self.get_roi(predicted_bbox, frame.shape)
+            boxes = self.predict(frame[y1:y2, x1:x2], self.roi_size)[0]
+            ball_dict = self.get_ball_dict(boxes, offset=(x1, y1))
+
+        self.update_roi_tracker(ball_dict)
+        return ball_dict
+
+    def get_roi(self, predicted_bbox, frame_shape):
+        frame_height, frame_width = frame_shape[:2]
+        roi_width = min(self.roi_size, frame_width)
+        roi_height = min(self.roi_size, frame_height)
+
+        center_x = (predicted_bbox[0] + predicted_bbox[2])/2
+        center_y = (predicted_bbox[1] + predicted_bbox[3])/2
+        x1 = int(min(max(center_x - roi_width/2, 0), frame_width - roi_width))
+        y1 = int(min(max(center_y - roi_height/2, 0), frame_height - roi_height))
+        return x1, y1, x1 + roi_width, y1 + roi_height
+
+    def detect_batch(self,frames):
+        return [self.get_ball_dict(boxes) for boxes in self.predict(frames, self.imgsz)]
+
+    def get_ball_dict(self,boxes, offset=(0, 0)):
+        # offset maps boxes found in a crop back to frame coordinates
+        offset_x, offset_y = offset
         ball_dict = {}
-        for box in results.boxes:
-            result = box.xyxy.tolist()[0]
-            ball_dict[1] = result
+        for box in boxes:
+            x1, y1, x2, y2 = box.tolist()
+            ball_dict[1] = [x1 + offset_x, y1 + offset_y, x2 + offset_x, y2 + offset_y]
         
         return ball_dict
 
     def draw_bboxes(self,video_frames, player_detections):
         output_video_frames = []
         for frame, ball_dict in zip(video_frames, player_detections):
-            # Draw Bounding Boxes
-            for track_id, bbox in ball_dict.items():
-                x1, y1, x2, y2 = bbox
-                cv2.putText(frame, f"Ball ID: {track_id}",(int(bbox[0]),int(bbox[1] -10 )),cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 255), 2)
-                cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), (0, 255, 255), 2)
+            frame = self.draw_frame_bboxes(frame, ball_dict)
             output_video_frames.append(frame)
         
         return output_video_frames
 
+    def draw_frame_bboxes(self, frame, ball_dict):
+        # Draw Bounding Boxes
+        for track_id, bbox in ball_dict.items():
+            x1, y1, x2, y2 = bbox
+            cv2.putText(frame, f"Ball ID: {track_id}",(int(bbox[0]),int(bbox[1] -10 )),cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 255), 2)
+            cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), (0, 255, 255), 2)
+        return frame
+
 
     
\ No newline at end of file
@@ -0,0 +1,105 @@
+import cv2
+import numpy as np
+
+class OpticalFlowBoxPropagator:
+    """
+    Moves detected boxes from frame to frame with sparse Lucas-Kanade optical flow.
+
+    start() takes the boxes of a keyframe and picks good features to track inside
+    each of them. propagate() follows those features into the next frame and
+    shifts every box by the median displacement of its features. It reports the
+    result as not confident when a box loses more than min_tracked_ratio of its
+    features or has drifted further than max_drift box heights from where it was
+    detected, so the caller can run the detector again.
+    Boxes without any trackable features (flat regions) are kept in place.
+    """
+
+    def __init__(self, max_corners_per_box=20, min_tracked_ratio=0.5, max_drift=0.5, max_forward_backward_error=1.0):
+        self.max_corners_per_box = max_corners_per_box
+        self.min_tracked_ratio = min_tracked_ratio
+        self.max_drift = max_drift
+        self.max_forward_backward_error = max_forward_backward_error
+        self.lk_params = dict(winSize=(21, 21), maxLevel=3,
+                              criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 20, 0.03))
+        self.reset()
+
+    def reset(self):
+        self.previous_gray = None
+        self.boxes = {}
+        self.keyframe_boxes = {}
+        self.points = {}
+        self.initial_point_counts = {}
+
+    def has_boxes(self):
+        return self.previous_gray is not None and len(self.boxes) > 0
+
+    def start(self, frame, player_dict):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        self.previous_gray = gray
+        self.boxes = {track_id: np.array(bbox, dtype=np.float32) for track_id, bbox in player_dict.items()}
+        self.keyframe_boxes = {track_id: bbox.copy() for track_id, bbox in self.boxes.items()}
+        self.points = {}
+        self.initial_point_counts = {}
+
+        frame_height, frame_width = gray.shape
+        for track_id, bbox in self.boxes.items():
+            x1, y1, x2, y2 = bbox
+            x1, y1 = max(int(x1), 0), max(int(y1), 0)
+            x2, y2 = min(int(x2), frame_width), min(int(y2), frame_height)
+            if x2 - x1 < 2 or y2 - y1 < 2:
+                continue
+            mask = np.zeros_like(gray)
+            mask[y1:y2, x1:x2] = 255
+            points = cv2.goodFeaturesToTrack(gray, maxCorners=self.max_corners_per_box,
+                                             qualityLevel=0.01, minDistance=3, mask=mask)
+            if points is not None:
+                self.points[track_id] = points.reshape(-1, 2)
+                self.initial_point_counts[track_id] = len(self.points[track_id])
+
+    def propagate(self, frame):
+        """Returns (player_dict, confident) for the next frame."""
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        confident = True
+
+        track_ids = [track_id for track_id in self.points if len(self.points[track_id]) > 0]
+        if track_ids:
+            previous_points = np.concatenate([self.points[track_id] for track_id in track_ids]).astype(np.float32)
+            next_points, status, _ = cv2.calcOpticalFlowPyrLK(self.previous_gray, gray, previous_points, None, **self.lk_params)
+            # forward-backward check rejects points that do not map back onto themselves
+            back_points, back_status, _ = cv2.calcOpticalFlowPyrLK(gray, self.previous_gray, next_points, None, **self.lk_params)
+            forward_backward_error = np.linalg.norm(back_points - previous_points, axis=1)
+            tracked = (status.ravel() == 1) & (back_status.ravel() == 1) & \
+                      (forward_backward_error < self.max_forward_backward_error)
+
+            start = 0
+            for track_id in track_ids:
+                count = len(self.points[track_id])
+                box_tracked = tracked[start:start + count]
+                box_previous = previous_points[start:start + count][box_tracked]
+                box_next = next_points[start:start + count][box_tracked]
+                start += count
+
+                if len(box_next) < self.min_tracked_ratio * self.initial_point_counts[track_id]:
+                    confident = False
+                if len(box_next) == 0:
+                    self.points[track_id] = box_next
+                    continue
+
+                shift_x, shift_y = np.median(box_next - box_previous, axis=0)
+                self.boxes[track_id] = self.boxes[track_id] + np.array([shift_x, shift_y, shift_x, shift_y], dtype=np.float32)
+                self.points[track_id] = box_next
+
+                if self._get_drift(track_id) > self.max_drift:
+                    confident = False
+
+        self.previous_gray = gray
+        player_dict = {track_id: bbox.tolist() for track_id, bbox in self.boxes.items()}
+        return player_dict, confident
+
+    def _get_drift(self, track_id):
+        keyframe_box = self.keyframe_boxes[track_id]
+        box = self.boxes[track_id]
+        box_height = max(keyframe_box[3] - keyframe_box[1], 1.0)
+        displacement = np.hypot((box[0] + box[2] - keyframe_box[0] - keyframe_box[2])/2,
+                                (box[1] + box[3] - keyframe_box[1] - keyframe_box[3])/2)
+        return displacement / box_height
@@ -1,23 +1,185 @@
 from ultralytics import YOLO 
 import cv2
+import numpy as np
 import pickle
 import sys
 sys.path.append('../')
-from utils import measure_distance, get_center_of_bbox
+from utils import measure_distance, get_center_of_bbox, DetectionTable, StaticFrameGate, CourtKeypointTimeline
+from inference_backends import OnnxYoloDetector
+from .box_propagator import OpticalFlowBoxPropagator
+import constants
 
 class PlayerTracker:
-    def __init__(self,model_path):
-        self.model = YOLO(model_path)
+    def __init__(self,model_path, conf=0.1, imgsz=640, keyframe_interval=None, flow_min_tracked_ratio=0.5, flow_max_drift=0.5,
+                 model=None, backend='ultralytics', onnx_threads=None, static_frame_threshold=None, court_margin=None):
+        self.model_path = model_path
+        # backend: 'ultralytics' (PyTorch, model.track) or 'onnx' (ONNX Runtime detections + ByteTrack)
+        self.backend = backend
+        if model is None:
+            model = OnnxYoloDetector(model_path, intra_op_threads=onnx_threads) if backend == 'onnx' else YOLO(model_path)
+        self.model = model
+        self.conf = conf
+        self.imgsz = imgsz
+
+        # Keyframe mode: run the detector every keyframe_interval frames and move the
+        # boxes in between with optical flow, re-detecting early when the flow is unreliable
+        self.keyframe_interval = keyframe_interval
+        self.flow_min_tracked_ratio = flow_min_tracked_ratio
+        self.flow_max_drift = flow_max_drift
+
+        self.static_frame_gate = StaticFrameGate(static_frame_threshold)
+
+        # Court region: detect only inside the bounding crop of the court polygon grown by
+        # court_margin; the caller sets it from the keypoints of each camera shot
+        self.court_margin = court_margin
+        self.court_polygon = None
+        self.court_crop = None
+        self.reset()
+
+    def reset(self):
+        # A shared model keeps the ByteTrack state of the previous video in its predictor
+        predictor = getattr(self.model, 'predictor', None)
+        for tracker in getattr(predictor, 'trackers', []):
+            tracker.reset()
+        self.byte_tracker = self.create_byte_tracker() if self.backend == 'onnx' else None
+
+        self.box_propagator = OpticalFlowBoxPropagator(min_tracked_ratio=self.flow_min_tracked_ratio,
+                                                       max_drift=self.flow_max_drift)
+        self.static_frame_gate.reset()
+
+        self.frames_since_keyframe = 0
+        self.keyframes = 0
+        self.propagated_frames = 0
+
+    def get_cache_params(self):
+        params = {'tracker': 'player', 'conf': self.conf, 'imgsz': self.imgsz}
+        if self.backend != 'ultralytics':
+            params['backend'] = self.backend
+        if self.keyframe_interval:
+            params['keyframe_interval'] = self.keyframe_interval
+            params['flow_min_tracked_ratio'] = self.flow_min_tracked_ratio
+            params['flow_max_drift'] = self.flow_max_drift
+        if self.static_frame_gate.is_enabled():
+            params['static_frame_threshold'] = self.static_frame_gate.threshold
+        # The region follows per-shot court keypoints, which the caller keys (main.py uses the court timeline)
+        if self.court_margin is not None:
+            params['court_margin'] = self.court_margin
+        return params
+
+    def set_court_region(self, court_keypoints, frame_shape, margin=None, player_heights=2.0):
+        """
+        Restrict detection to the court. The convex hull of the court keypoints is
+        scaled up by margin (default: court_margin, else 0.25) around its centre, so
+        players wide of the tramlines are still inside. Above the far baseline and
+        below the near one it is extended by player_heights standing players, scaled
+        to pixels by that baseline's width: one for the player and one for the room
+        they have behind the baseline. Detection runs on the bounding crop of that
+        polygon and boxes that do not overlap it are dropped.
+        """
+        if margin is None:
+            margin = self.court_margin if self.court_margin is not None else 0.25
+        points = np.array(court_keypoints, dtype=np.float32).reshape(-1, 2)
+        hull = cv2.convexHull(points).reshape(-1, 2)
+        center = hull.mean(axis=0)
+        scaled_hull = center + (hull - center)*(1 + margin)
+
+        # Keypoints 0, 1 are the far baseline corners and 2, 3 the near ones
+        player_height = max(constants.PLAYER_1_HEIGHT_METERS, constants.PLAYER_2_HEIGHT_METERS)*player_heights
+        far_reach = player_height*np.linalg.norm(points[1] - points[0])/constants.DOUBLE_LINE_WIDTH
+        near_reach = player_height*np.linalg.norm(points[3] - points[2])/constants.DOUBLE_LINE_WIDTH
+        extended = np.concatenate([scaled_hull,
+                                   points[[0, 1]] - [0, far_reach],
+                                   points[[2, 3]] + [0, near_reach]]).astype(np.float32)
+        self.court_polygon = cv2.convexHull(extended).reshape(-1, 2)
+
+        frame_height, frame_width = frame_shape[:2]
+        x1, y1 = np.floor(self.court_polygon.min(axis=0)).astype(int).tolist()
+        x2, y2 = np.ceil(self.court_polygon.max(axis=0)).astype(int).tolist()
+        self.court_crop = (max(x1, 0), max(y1, 0), min(x2, frame_width), min(y2, frame_height))
+
+    def clear_court_region(self):
+        self.court_polygon = None
+        self.court_crop = None
+
+    def is_on_court(self, bbox):
+        if self.court_polygon is None:
+            return True
+        x1, y1, x2, y2 = bbox
+        box_polygon = np.array([[x1, y1], [x2, y1], [x2, y2], [x1, y2]], dtype=np.float32)
+        overlap_area, _ = cv2.intersectConvexConvex(box_polygon, self.court_polygon)
+        return overlap_area > 0
+
+    def create_byte_tracker(self):
+        # Same tracker and settings model.track uses by default
+        from ultralytics.trackers.byte_tracker import BYTETracker
+        from ultralytics.utils import IterableSimpleNamespace, yaml_load
+        from ultralytics.utils.checks import check_yaml
+        tracker_args = IterableSimpleNamespace(**yaml_load(check_yaml('bytetrack.yaml')))
+        return BYTETracker(args=tracker_args, frame_rate=30)
+
+    def get_reuse_stats(self):
+        return self.static_frame_gate.get_stats()
+
+    def get_keyframe_stats(self):
+        return {'keyframes': self.keyframes, 'propagated_frames': self.propagated_frames}
 
     def choose_and_filter_players(self, court_keypoints, player_detections):
+        """
+        Keep the two tracks closest to the court. court_keypoints is one keypoint
+        array, or a CourtKeypointTimeline to choose the players again on every
+        play shot with that shot's keypoints.
+        """
+        if isinstance(court_keypoints, CourtKeypointTimeline):
+            return self.choose_and_filter_players_per_shot(court_keypoints, player_detections)
+
         player_detections_first_frame = player_detections[0]
         chosen_player = self.choose_players(court_keypoints, player_detections_first_frame)
+        if isinstance(player_detections, DetectionTable):
+            return player_detections.filter_tracks(chosen_player)
+
         filtered_player_detections = []
         for player_dict in player_detections:
             filtered_player_dict = {track_id: bbox for track_id, bbox in player_dict.items() if track_id in chosen_player}
             filtered_player_detections.append(filtered_player_dict)
         return filtered_player_detections
 
+    def choose_and_filter_players_per_shot(self, court_keypoint_timeline, player_detections):
+        """
+        Choose the players of each play shot on its first frame with two or more
+        detections, using the shot's court keypoints. After a cut the tracker hands
+        out new ids, so the players of later shots are renamed to the ids chosen
+        on the first shot, matched by court side (the far player is higher in the
+        frame). Shots without two players are left empty.
+        """
+        frame_dicts = player_detections.to_frame_dicts() if isinstance(player_detections, DetectionTable) else list(player_detections)
+        num_frames = len(frame_dicts)
+        filtered_player_detections = [{} for _ in range(num_frames)]
+
+        reference_players = None
+        segment_ends = court_keypoint_timeline.start_frames[1:] + [num_frames]
+        for start_frame, end_frame, court_keypoints, is_play in zip(court_keypoint_timeline.start_frames, segment_ends,
+                                                                    court_keypoint_timeline.keypoints, court_keypoint_timeline.is_play):
+            end_frame = min(end_frame, num_frames)
+            if not is_play:
+                continue
+            choice_frame = next((frame_num for frame_num in range(start_frame, end_frame) if len(frame_dicts[frame_num]) >= 2), None)
+            if choice_frame is None:
+                continue
+
+            # Far player first
+            chosen_players = sorted(self.choose_players(court_keypoints, frame_dicts[choice_frame]),
+                                    key=lambda track_id: frame_dicts[choice_frame][track_id][3])
+            if reference_players is None:
+                reference_players = chosen_players
+            player_ids = dict(zip(chosen_players, reference_players))
+            for frame_num in range(start_frame, end_frame):
+                filtered_player_detections[frame_num] = {player_ids[track_id]: bbox for track_id, bbox in frame_dicts[frame_num].items()
+                                                         if track_id in player_ids}
+
+        if isinstance(player_detections, DetectionTable):
+            return DetectionTable.from_frame_dicts(filtered_player_detections)
+        return filtered_player_detections
+
     def choose_players(self, court_keypoints, player_dict):
         distances = []
         for track_id, bbox in player_dict.items():
@@ -46,9 +208,9 @@ class PlayerTracker:
                 player_detections = pickle.load(f)
             return player_detections
 
-        for frame in frames:
-            player_dict = self.detect_frame(frame)
-            player_detections.append(player_dict)
+        detect = self.detect_frame_keyframed if self.keyframe_interval else self.detect_frame
+        # Static frames reuse the detections of the last inferred frame before them
+        player_detections = self.static_frame_gate.detect(frames, lambda frames: [detect(frame) for frame in frames])
         
         if stub_path is not None:
             with open(stub_path, 'wb') as f:
@@ -57,31 +219,66 @@ class PlayerTracker:
         return player_detections
 
     def detect_frame(self,frame):
-        results = self.model.track(frame, persist=True)[0]
-        id_name_dict = results.names
+        offset_x, offset_y = 0, 0
+        if self.court_crop is not None:
+            offset_x, offset_y, x2, y2 = self.court_crop
+            frame = frame[offset_y:y2, offset_x:x2]
 
         player_dict = {}
-        for box in results.boxes:
-            track_id = int(box.id.tolist()[0])
-            result = box.xyxy.tolist()[0]
-            object_cls_id = box.cls.tolist()[0]
-            object_cls_name = id_name_dict[object_cls_id]
-            if object_cls_name == "person":
+        for track_id, (x1, y1, x2, y2), object_cls_name in self.track(frame):
+            result = [x1 + offset_x, y1 + offset_y, x2 + offset_x, y2 + offset_y]
+            if object_cls_name == "person" and self.is_on_court(result):
                 player_dict[track_id] = result
         
         return player_dict
 
+    def track(self, frame):
+        """(track_id, xyxy, class name) of every tracked box in frame, from the configured backend."""
+        if self.backend == 'onnx':
+            detections = self.model.predict(frame, conf=self.conf, imgsz=self.imgsz)[0]
+            tracks = self.byte_tracker.update(detections, frame)
+            # rows are x1, y1, x2, y2, track_id, score, cls, detection index
+            return [(int(row[4]), row[:4].tolist(), self.model.names[int(row[6])]) for row in tracks]
+
+        results = self.model.track(frame, persist=True, conf=self.conf, imgsz=self.imgsz)[0]
+        id_name_dict = results.names
+        tracked_boxes = []
+        for box in results.boxes:
+            if box.id is None:
+                continue
+            tracked_boxes.append((int(box.id.tolist()[0]), box.xyxy.tolist()[0], id_name_dict[box.cls.tolist()[0]]))
+        return tracked_boxes
+
+    def detect_frame_keyframed(self,frame):
+        if self.frames_since_keyframe < self.keyframe_interval and self.box_propagator.has_boxes():
+            player_dict, confident = self.box_propagator.propagate(frame)
+            if confident:
+                self.frames_since_keyframe += 1
+                self.propagated_frames += 1
+                return player_dict
+
+        # Keyframe, or the flow lost the players: detect and restart propagation from here
+        player_dict = self.detect_frame(frame)
+        self.box_propagator.start(frame, player_dict)
+        self.frames_since_keyframe = 1
+        self.keyframes += 1
+        return player_dict
+
     def draw_bboxes(self,video_frames, player_detections):
         output_video_frames = []
         for frame, player_dict in zip(video_frames, player_detections):
-            # Draw Bounding Boxes
-            for track_id, bbox in player_dict.items():
-                x1, y1, x2, y2 = bbox
-                cv2.putText(frame, f"Player ID: {track_id}",(int(bbox[0]),int(bbox[1] -10 )),cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 0, 255), 2)
-                cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), (0, 0, 255), 2)
+            frame = self.draw_frame_bboxes(frame, player_dict)
             output_video_frames.append(frame)
         
         return output_video_frames
 
+    def draw_frame_bboxes(self, frame, player_dict):
+        # Draw Bounding Boxes
+        for track_id, bbox in player_dict.items():
+            x1, y1, x2, y2 = bbox
+            cv2.putText(frame, f"Player ID: {track_id}",(int(bbox[0]),int(bbox[1] -10 )),cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 0, 255), 2)
+            cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), (0, 0, 255), 2)
+        return frame
+
 
     
\ No newline at end of file
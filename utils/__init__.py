@@ -1,4 +1,19 @@
-from .video_utils import read_video, save_video
+from .video_utils import (read_video,
+                          save_video,
+                          iter_video_frames,
+                          chunk_frames,
+                          read_video_chunks,
+                          read_first_frame,
+                          read_sampled_frames,
+                          get_video_fps,
+                          get_video_extension,
+                          PrefetchVideoReader,
+                          AsyncVideoWriter,
+                          VIDEO_CODECS
+                          )
 from .bbox_utils import get_center_of_bbox, measure_distance, get_foot_position,get_closest_keypoint_index,get_height_of_bbox,measure_xy_distance,get_center_of_bbox
 from .conversions import convert_pixel_distance_to_meters, convert_meters_to_pixel_distance
-from .player_stats_drawer_utils import draw_player_stats
\ No newline at end of file
+from .player_stats_drawer_utils import draw_player_stats
+from .detection_table import DetectionTable
+from .court_keypoint_timeline import CourtKeypointTimeline
+from .static_frame_gate import StaticFrameGate
@@ -0,0 +1,69 @@
+import os
+from bisect import bisect_right
+import numpy as np
+
+class CourtKeypointTimeline:
+    """
+    Court keypoints per camera shot.
+
+    Each segment starts at a frame (start_frames, ascending) and holds the 28
+    keypoint values predicted on that frame. get(frame_num) returns the
+    keypoints of the segment containing frame_num, found by binary search.
+    Segments can be marked as non-play (replays, crowd shots, scoreboards):
+    their keypoints are NaN and their frames are skipped by detection and stats.
+    Like DetectionTable, it is saved as a directory of .npy arrays so it can
+    live in the detection cache.
+    """
+    COLUMNS = ['start_frames', 'keypoints', 'is_play']
+
+    def __init__(self, start_frames=None, keypoints=None, is_play=None):
+        self.start_frames = [int(frame) for frame in start_frames] if start_frames is not None else []
+        self.keypoints = [np.asarray(k, dtype=np.float32) for k in keypoints] if keypoints is not None else []
+        self.is_play = [bool(play) for play in is_play] if is_play is not None else [True]*len(self.start_frames)
+
+    def add(self, start_frame, keypoints, is_play=True):
+        if self.start_frames and start_frame <= self.start_frames[-1]:
+            raise ValueError(f"Segments must be added in order: {start_frame} after {self.start_frames[-1]}")
+        self.start_frames.append(int(start_frame))
+        self.keypoints.append(np.asarray(keypoints, dtype=np.float32))
+        self.is_play.append(bool(is_play))
+
+    def get_segment_index(self, frame_num):
+        # Frames before the first segment use the first segment
+        return max(bisect_right(self.start_frames, frame_num) - 1, 0)
+
+    def get(self, frame_num):
+        return self.keypoints[self.get_segment_index(frame_num)]
+
+    def is_play_frame(self, frame_num):
+        return self.is_play[self.get_segment_index(frame_num)] if self.is_play else True
+
+    def get_play_mask(self, num_frames):
+        """Boolean array over the first num_frames frames, False on non-play frames."""
+        play_mask = np.ones(num_frames, dtype=bool)
+        segment_ends = self.start_frames[1:] + [num_frames]
+        for start_frame, end_frame, is_play in zip(self.start_frames, segment_ends, self.is_play):
+            if not is_play:
+                play_mask[start_frame:end_frame] = False
+        return play_mask
+
+    def get_segment_starts_in(self, start_frame, end_frame):
+        """Segment start frames in [start_frame, end_frame)."""
+        first = bisect_right(self.start_frames, start_frame - 1)
+        last = bisect_right(self.start_frames, end_frame - 1)
+        return self.start_frames[first:last]
+
+    def __len__(self):
+        return len(self.start_frames)
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, 'start_frames.npy'), np.array(self.start_frames, dtype=np.int64))
+        np.save(os.path.join(directory, 'keypoints.npy'), np.array(self.keypoints, dtype=np.float32).reshape(-1, 28))
+        np.save(os.path.join(directory, 'is_play.npy'), np.array(self.is_play, dtype=bool))
+
+    @classmethod
+    def load(cls, directory, mmap=False):
+        columns = {column: np.load(os.path.join(directory, f"{column}.npy"), allow_pickle=False)
+                   for column in cls.COLUMNS}
+        return cls(**columns)
@@ -0,0 +1,105 @@
+import os
+import numpy as np
+
+class DetectionTable:
+    """
+    Columnar storage of per-frame detections.
+
+    Each detection is one row across the column arrays:
+        frame:     frame index (int32)
+        track_id:  track id (int32)
+        bbox:      x1, y1, x2, y2 (float32, shape (N, 4))
+    Rows are grouped by frame and frame_offsets[f]:frame_offsets[f+1] are the rows
+    of frame f, so len(frame_offsets) - 1 is the number of frames (including frames
+    without detections).
+
+    A table behaves like the list[dict[track_id, bbox]] format used elsewhere:
+    table[f] returns {track_id: [x1, y1, x2, y2]}, slicing returns a table and
+    iteration yields one dict per frame.
+    """
+    COLUMNS = ['frame', 'track_id', 'bbox', 'frame_offsets']
+
+    def __init__(self, frame, track_id, bbox, frame_offsets):
+        self.frame = frame
+        self.track_id = track_id
+        self.bbox = bbox
+        self.frame_offsets = frame_offsets
+
+    @classmethod
+    def from_frame_dicts(cls, frame_dicts):
+        frame_dicts = list(frame_dicts)
+        counts = np.array([len(frame_dict) for frame_dict in frame_dicts], dtype=np.int64)
+        num_rows = int(counts.sum())
+
+        frame = np.repeat(np.arange(len(frame_dicts), dtype=np.int32), counts)
+        track_id = np.fromiter((track_id for frame_dict in frame_dicts for track_id in frame_dict),
+                               dtype=np.int32, count=num_rows)
+        bbox = np.array([bbox for frame_dict in frame_dicts for bbox in frame_dict.values()],
+                        dtype=np.float32).reshape(num_rows, 4)
+        frame_offsets = np.zeros(len(frame_dicts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=frame_offsets[1:])
+
+        return cls(frame, track_id, bbox, frame_offsets)
+
+    def to_frame_dicts(self):
+        return list(self)
+
+    def __len__(self):
+        return len(self.frame_offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                raise ValueError("DetectionTable slices must be contiguous")
+            stop = max(start, stop)
+            row_start, row_stop = self.frame_offsets[start], self.frame_offsets[stop]
+            return DetectionTable(self.frame[row_start:row_stop] - start,
+                                  self.track_id[row_start:row_stop],
+                                  self.bbox[row_start:row_stop],
+                                  self.frame_offsets[start:stop + 1] - row_start)
+
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("frame index out of range")
+        row_start, row_stop = self.frame_offsets[index], self.frame_offsets[index + 1]
+        return {int(track_id): bbox.tolist()
+                for track_id, bbox in zip(self.track_id[row_start:row_stop], self.bbox[row_start:row_stop])}
+
+    def __iter__(self):
+        for frame_num in range(len(self)):
+            yield self[frame_num]
+
+    def get_track_ids(self):
+        return np.unique(self.track_id).tolist()
+
+    def boxes_for_track(self, track_id):
+        """(num_frames, 4) float array of one track's boxes, NaN where the track is missing."""
+        boxes = np.full((len(self), 4), np.nan)
+        mask = self.track_id == track_id
+        boxes[self.frame[mask]] = self.bbox[mask]
+        return boxes
+
+    def filter_tracks(self, track_ids):
+        mask = np.isin(self.track_id, track_ids)
+        frame = self.frame[mask]
+        frame_offsets = np.zeros(len(self) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(frame, minlength=len(self)), out=frame_offsets[1:])
+        return DetectionTable(frame, self.track_id[mask], self.bbox[mask], frame_offsets)
+
+    def get_nbytes(self):
+        return sum(getattr(self, column).nbytes for column in self.COLUMNS)
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        for column in self.COLUMNS:
+            np.save(os.path.join(directory, f"{column}.npy"), np.ascontiguousarray(getattr(self, column)))
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        # Memory-mapped columns are paged in on first access instead of being read up front
+        mmap_mode = 'r' if mmap else None
+        columns = {column: np.load(os.path.join(directory, f"{column}.npy"), mmap_mode=mmap_mode, allow_pickle=False)
+                   for column in cls.COLUMNS}
+        return cls(**columns)
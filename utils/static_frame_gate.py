@@ -0,0 +1,84 @@
+import cv2
+import numpy as np
+
+class StaticFrameGate:
+    """
+    Decides whether a frame is close enough to the last inferred frame to reuse its detections.
+
+    Frames are converted to grayscale and downscaled to width pixels with area
+    averaging, which removes compression noise. The change is the largest
+    absolute pixel difference to the reference, not the mean, so a small moving
+    ball still counts as change. update() returns True for a static frame; any
+    other frame becomes the new reference, so slow drift cannot accumulate
+    unnoticed over a run of reused frames. A threshold of None or 0 turns the
+    gate off: every frame is inferred.
+
+    detect() does the bookkeeping for a tracker: it runs the tracker's detector
+    on the frames that changed and copies the last detections to the others.
+    """
+
+    def __init__(self, threshold=6.0, width=160):
+        self.threshold = threshold
+        self.width = width
+        self.reset()
+
+    def reset(self):
+        self.reference = None
+        self.last_detections = None
+        # True for every frame whose detections were copied from the previous frame
+        self.reused_mask = []
+        self.reused_frames = 0
+        self.inferred_frames = 0
+
+    def is_enabled(self):
+        return bool(self.threshold)
+
+    def get_thumbnail(self, frame):
+        frame_height, frame_width = frame.shape[:2]
+        height = max(int(frame_height * self.width / frame_width), 1)
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        return cv2.resize(gray, (self.width, height), interpolation=cv2.INTER_AREA).astype(np.int16)
+
+    def update(self, frame):
+        if not self.is_enabled():
+            return False
+        thumbnail = self.get_thumbnail(frame)
+        if self.reference is not None and np.abs(thumbnail - self.reference).max() < self.threshold:
+            self.reused_frames += 1
+            return True
+
+        self.reference = thumbnail
+        self.inferred_frames += 1
+        return False
+
+    def detect(self, frames, detect_fn, on_reuse=None):
+        """
+        Detections (one dict per frame) for frames. The frames that changed go to
+        detect_fn(frames), which returns their dicts in order; each static frame
+        gets a copy of the dict of the last inferred frame before it. on_reuse(dict)
+        is called for every copy, after detect_fn, so per-frame tracker state such
+        as a motion model still steps through static runs.
+        """
+        static_mask = [self.update(frame) for frame in frames]
+        frames_to_detect = [frame for frame, is_static in zip(frames, static_mask) if not is_static]
+        detected = iter(detect_fn(frames_to_detect) if frames_to_detect else [])
+
+        detections = []
+        for is_static in static_mask:
+            if is_static:
+                detection_dict = dict(self.last_detections)
+                if on_reuse is not None:
+                    on_reuse(detection_dict)
+            else:
+                detection_dict = next(detected)
+                self.last_detections = detection_dict
+            self.reused_mask.append(is_static)
+            detections.append(detection_dict)
+        return detections
+
+    def get_stats(self):
+        if not self.is_enabled():
+            return None
+        return {'static_frame_threshold': self.threshold,
+                'reused_frames': self.reused_frames,
+                'inferred_frames': self.inferred_frames}
@@ -1,19 +1,264 @@
 import cv2
+import os
+import queue
+import threading
+
+def iter_video_frames(video_path):
+    cap = cv2.VideoCapture(video_path)
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield frame
+    finally:
+        cap.release()
+
+def chunk_frames(frames, chunk_size):
+    # Group any frame iterable into lists of at most chunk_size frames, so only
+    # one window of decoded frames is alive at a time
+    chunk = []
+    for frame in frames:
+        chunk.append(frame)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def read_video_chunks(video_path, chunk_size=64):
+    return chunk_frames(iter_video_frames(video_path), chunk_size)
+
+def read_first_frame(video_path):
+    frames = iter_video_frames(video_path)
+    try:
+        return next(frames, None)
+    finally:
+        frames.close()
+
+def read_sampled_frames(video_path, num_frames=16):
+    """Up to num_frames frames spread evenly over the video."""
+    cap = cv2.VideoCapture(video_path)
+    try:
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        if frame_count <= 0:
+            return []
+        frames = []
+        step = (frame_count - 1) / max(num_frames - 1, 1)
+        for frame_num in sorted({round(i*step) for i in range(num_frames)}):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, frame_num)
+            ret, frame = cap.read()
+            if ret:
+                frames.append(frame)
+        return frames
+    finally:
+        cap.release()
+
+class PrefetchVideoReader:
+    """
+    Iterates over the frames of a video while a background thread decodes ahead
+    into a bounded queue, so decoding overlaps with whatever consumes the frames.
+
+    The queue holds at most `depth` frames; when it is full the decoder blocks
+    (backpressure). Stalls on both sides are counted:
+        decoder_stalls: times the decoder found the queue full and had to wait
+        consumer_stalls: times the consumer found the queue empty and had to wait
+    """
+    _END = object()
+
+    def __init__(self, video_path, depth=32):
+        self.video_path = video_path
+        self.depth = depth
+        self.frames_decoded = 0
+        self.decoder_stalls = 0
+        self.consumer_stalls = 0
+        self._queue = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._error = None
+
+    def __iter__(self):
+        self._start()
+        try:
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    self.consumer_stalls += 1
+                    item = self._queue.get()
+                if item is self._END:
+                    break
+                yield item
+        finally:
+            self.close()
+
+        if self._error is not None:
+            raise self._error
+
+    def _start(self):
+        self.close()
+        self.frames_decoded = 0
+        self.decoder_stalls = 0
+        self.consumer_stalls = 0
+        self._queue = queue.Queue(maxsize=max(1, self.depth))
+        self._stop.clear()
+        self._error = None
+        self._thread = threading.Thread(target=self._decode, daemon=True)
+        self._thread.start()
+
+    def _decode(self):
+        try:
+            for frame in iter_video_frames(self.video_path):
+                if self._stop.is_set() or not self._put(frame):
+                    return
+                self.frames_decoded += 1
+        except Exception as e:
+            self._error = e
+        self._put(self._END)
+
+    def _put(self, item):
+        try:
+            self._queue.put_nowait(item)
+            return True
+        except queue.Full:
+            self.decoder_stalls += 1
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def close(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def get_stats(self):
+        return {
+            'prefetch_depth': self.depth,
+            'frames_decoded': self.frames_decoded,
+            'decoder_stalls': self.decoder_stalls,
+            'consumer_stalls': self.consumer_stalls
+        }
 
 def read_video(video_path):
+    return list(iter_video_frames(video_path))
+
+def get_video_fps(video_path, default_fps=24):
     cap = cv2.VideoCapture(video_path)
-    frames = []
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-        frames.append(frame)
+    fps = cap.get(cv2.CAP_PROP_FPS)
     cap.release()
-    return frames
-
-def save_video(output_video_frames, output_video_path):
-    fourcc = cv2.VideoWriter_fourcc(*'MJPG')
-    out = cv2.VideoWriter(output_video_path, fourcc, 24, (output_video_frames[0].shape[1], output_video_frames[0].shape[0]))
-    for frame in output_video_frames:
-        out.write(frame)
-    out.release()
\ No newline at end of file
+    return fps if fps and fps > 0 else default_fps
+
+# codec name -> (fourcc, container extension)
+# h264 and vp8 play in browsers; mp4v and mjpg are kept for players/builds that need them
+VIDEO_CODECS = {
+    'h264': ('avc1', '.mp4'),
+    'vp8': ('VP80', '.webm'),
+    'mp4v': ('mp4v', '.mp4'),
+    'mjpg': ('MJPG', '.avi'),
+}
+
+# Many OpenCV builds (including the pip opencv-python wheels) ship without an H.264
+# encoder; fall back to another codec browsers can play. The container changes with it.
+VIDEO_CODEC_FALLBACKS = {
+    'h264': ['vp8'],
+}
+
+def get_video_extension(codec):
+    return VIDEO_CODECS[codec][1]
+
+class AsyncVideoWriter:
+    """
+    Incremental video writer: frames are handed over with write() as soon as they
+    are rendered and encoded on a worker thread, so rendering and encoding overlap.
+    At most `queue_depth` frames wait for the encoder; write() blocks beyond that.
+    When the codec falls back to one with another container, output_video_path
+    and codec are updated to what is actually written.
+    """
+    _END = object()
+
+    def __init__(self, output_video_path, frame_width, frame_height, fps=24, codec='h264', queue_depth=32):
+        if codec not in VIDEO_CODECS:
+            raise ValueError(f"Unknown codec '{codec}'. Available: {', '.join(VIDEO_CODECS)}")
+
+        self.output_video_path = output_video_path
+        self.fps = fps
+        self.codec = codec
+        self.frames_written = 0
+        self._writer = self._open_writer(frame_width, frame_height)
+        self._queue = queue.Queue(maxsize=max(1, queue_depth))
+        self._error = None
+        self._thread = threading.Thread(target=self._encode, daemon=True)
+        self._thread.start()
+
+    def _open_writer(self, frame_width, frame_height):
+        requested_path = self.output_video_path
+        for codec in [self.codec] + VIDEO_CODEC_FALLBACKS.get(self.codec, []):
+            fourcc, extension = VIDEO_CODECS[codec]
+            output_video_path = requested_path
+            if codec != self.codec:
+                output_video_path = os.path.splitext(requested_path)[0] + extension
+            existed = os.path.exists(output_video_path)
+            writer = cv2.VideoWriter(output_video_path, cv2.VideoWriter_fourcc(*fourcc), self.fps, (frame_width, frame_height))
+            if writer.isOpened():
+                if codec != self.codec:
+                    print(f"Codec '{self.codec}' is not available, using '{codec}' instead: {output_video_path}")
+                    self.codec = codec
+                    self.output_video_path = output_video_path
+                return writer
+            writer.release()
+            # Do not leave an empty file behind that would be served instead of the fallback
+            if not existed and os.path.exists(output_video_path):
+                os.remove(output_video_path)
+        raise RuntimeError(f"Could not open video writer for {requested_path} with codec '{self.codec}'")
+
+    def _encode(self):
+        while True:
+            frame = self._queue.get()
+            if frame is self._END:
+                break
+            # keep draining after a failure so write() never blocks forever
+            if self._error is not None:
+                continue
+            try:
+                self._writer.write(frame)
+                self.frames_written += 1
+            except Exception as e:
+                self._error = e
+
+    def write(self, frame):
+        if self._error is not None:
+            raise self._error
+        self._queue.put(frame)
+
+    def release(self):
+        if self._thread is None:
+            return
+        self._queue.put(self._END)
+        self._thread.join()
+        self._thread = None
+        self._writer.release()
+        if self._error is not None:
+            raise self._error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+def save_video(output_video_frames, output_video_path, fps=24, codec='mjpg'):
+    writer = AsyncVideoWriter(output_video_path,
+                              output_video_frames[0].shape[1],
+                              output_video_frames[0].shape[0],
+                              fps=fps,
+                              codec=codec
+                              )
+    with writer:
+        for frame in output_video_frames:
+            writer.write(frame)